@@ -45,6 +45,7 @@ convert_img -b *.jpg -f png                # Batch convert
 ## Testing
 - Basic functionality tests in test_basic.py
 - Comprehensive pytest suite in tests/
+- Parallel runs with `pytest -n auto --dist=loadfile` (pytest-xdist)
 - Coverage reporting available
 - CI-friendly test runner
 
@@ -57,9 +58,11 @@ convert_img -b *.jpg -f png                # Batch convert
 - Screenshot processing
 
 ## Dependencies
-- Pillow: Core image processing
-- potrace: Vector to raster conversion
-- pytest: Testing framework
+- Pillow: Core image processing (nixpkgs links it against libjpeg-turbo)
+- pybase64: SIMD base64 encoding for embedded SVGs (optional)
+- pyvips: streaming libvips backend for very large images (optional)
+- potrace: Vector to raster conversion (its mkbitmap backs --mkbitmap)
+- pytest: Testing framework (pytest-xdist for parallel runs)
 
 ## Configuration
 Enabled via:
@@ -78,6 +81,7 @@ Enabled via:
       flakeIgnore = ["W291" "W503" "E226" "E501" "W293"];
       libraries = with pkgs.python3Packages; [
         pillow
+        pybase64
       ];
     }
     ./convert_img.py;
@@ -8,15 +8,339 @@ options like quality, compression, and transparency handling.
 
 from __future__ import annotations
 import argparse
-import base64
+import contextlib
+import functools
+import glob
+import importlib
 import io
+import os
+import shutil
+import subprocess
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-
-from PIL import Image, UnidentifiedImageError
-
-
-def parse_args() -> argparse.Namespace:
+from typing import BinaryIO, Callable, Iterator
+
+from PIL import (
+    Image,
+    ImageChops,
+    ImageColor,
+    ImageFilter,
+    UnidentifiedImageError,
+    features,
+)
+
+try:
+    # SIMD-accelerated drop-in replacement for the stdlib base64 module
+    import pybase64 as base64
+
+    # Encodes straight to str, skipping the intermediate bytes object
+    b64encode_str = base64.b64encode_as_string
+except ImportError:
+    import base64
+
+    def b64encode_str(data: bytes | memoryview) -> str:
+        """Base64 encode data to an ASCII string."""
+        return base64.b64encode(data).decode("ascii")
+
+# libimagequant is an optional Pillow build dependency
+HAS_LIBIMAGEQUANT = bool(features.check_feature("libimagequant"))
+
+# Bytes read per base64 step when streaming embedded images (multiple of 3)
+EMBED_CHUNK_SIZE = 3 * 64 * 1024
+
+# Pillow formats whose encoders write strictly forwards and can stream into
+# a pipe; others (TIFF, ICO, ...) seek back and are encoded in memory first
+_STREAMABLE_FORMATS = frozenset({"PNG", "JPEG", "WEBP", "BMP", "GIF", "AVIF"})
+
+# Lookup table thresholding grayscale at 128 for 1-bit tracing input
+_THRESHOLD_LUT = [0] * 128 + [255] * 128
+
+# mkbitmap's default highpass radius and threshold (0.45 of full scale)
+_MKBITMAP_RADIUS = 4
+_MKBITMAP_THRESHOLD = 0.45
+_MKBITMAP_LUT = [0] * 115 + [255] * 141
+
+# Map file extensions to formats
+_EXT_TO_FORMAT = {
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".png": "png",
+    ".webp": "webp",
+    ".tiff": "tiff",
+    ".tif": "tiff",
+    ".bmp": "bmp",
+    ".gif": "gif",
+    ".avif": "avif",
+    ".heif": "heif",
+    ".heic": "heif",
+    ".ico": "ico",
+    ".svg": "svg",
+}
+
+# File extensions picked up when an input path is a directory
+_INPUT_EXTENSIONS = frozenset(
+    {
+        ".jpg",
+        ".jpeg",
+        ".png",
+        ".webp",
+        ".tiff",
+        ".tif",
+        ".bmp",
+        ".gif",
+        ".avif",
+        ".heif",
+        ".heic",
+        ".ico",
+        ".pcx",
+        ".tga",
+        ".icns",
+        ".ppm",
+        ".pgm",
+        ".pbm",
+        ".xbm",
+        ".xpm",
+    }
+)
+
+# Map --tiff-compression choices to Pillow compression names
+_TIFF_COMPRESSION = {
+    "zstd": "zstd",
+    "deflate": "tiff_deflate",
+    "lzw": "tiff_lzw",
+    "none": "raw",
+}
+
+# Magic bytes of common image formats: (offset, signature, Pillow format)
+_MAGIC = (
+    (0, b"\x89PNG\r\n\x1a\n", "PNG"),
+    (0, b"\xff\xd8\xff", "JPEG"),
+    (0, b"GIF87a", "GIF"),
+    (0, b"GIF89a", "GIF"),
+    (8, b"WEBPVP8", "WEBP"),
+    (0, b"II*\x00", "TIFF"),
+    (0, b"MM\x00*", "TIFF"),
+    (4, b"ftypavif", "AVIF"),
+    (4, b"ftypavis", "AVIF"),
+    (0, b"BM", "BMP"),
+)
+
+# Input formats known to convert cleanly
+_ALLOWED_FORMATS = frozenset(
+    {
+        "WEBP",
+        "PNG",
+        "JPEG",
+        "JPG",
+        "GIF",
+        "BMP",
+        "TIFF",
+        "TIF",
+        "AVIF",
+        "HEIF",
+        "HEIC",
+        "ICO",
+        "PCX",
+        "TGA",
+        "ICNS",
+        "PPM",
+        "PGM",
+        "PBM",
+        "XBM",
+        "XPM",
+    }
+)
+
+# Map --resample choices to Pillow resampling filters
+_RESAMPLE_FILTERS = {
+    "lanczos": Image.Resampling.LANCZOS,
+    "bicubic": Image.Resampling.BICUBIC,
+    "bilinear": Image.Resampling.BILINEAR,
+}
+
+# MIME types for formats that can be embedded in an SVG
+_MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "tiff": "image/tiff",
+    "bmp": "image/bmp",
+    "avif": "image/avif",
+}
+
+# SVG paint values accepted for --background besides Pillow color strings
+_SVG_PAINT_KEYWORDS = frozenset({"none", "transparent", "currentcolor"})
+
+# Format-specific save arguments for embedded images, keyed by Pillow format
+_EMBED_SAVE_KWARGS = {
+    "JPEG": lambda quality, **_: {"quality": quality, "optimize": True},
+    "PNG": lambda **_: {"optimize": True},
+    "WEBP": lambda quality, webp_method, webp_lossless, **_: {
+        "quality": quality,
+        "optimize": True,
+        "method": webp_method,
+        "lossless": webp_lossless,
+    },
+    "TIFF": lambda tiff_compression, **_: {
+        "compression": _TIFF_COMPRESSION[tiff_compression],
+    },
+    "AVIF": lambda quality, **_: {"quality": quality, "optimize": True},
+}
+
+# Pillow plugin module that registers each format for opening and saving
+_PLUGINS = {
+    "JPEG": "JpegImagePlugin",
+    "PNG": "PngImagePlugin",
+    "WEBP": "WebPImagePlugin",
+    "TIFF": "TiffImagePlugin",
+    "BMP": "BmpImagePlugin",
+    "GIF": "GifImagePlugin",
+    "AVIF": "AvifImagePlugin",
+    "ICO": "IcoImagePlugin",
+}
+
+# Map --subsampling choices to libavif's chroma subsampling names
+_AVIF_SUBSAMPLING = {0: "4:4:4", 1: "4:2:2", 2: "4:2:0"}
+
+
+def _avif_save_kwargs(
+    quality: int,
+    optimize: bool,
+    subsampling: int,
+    avif_speed: int,
+    threads: int | None,
+    **_,
+) -> dict:
+    """Build AVIF save arguments, leaving unset knobs to libavif."""
+    save_kwargs = {"quality": quality, "optimize": optimize, "speed": avif_speed}
+    if subsampling in _AVIF_SUBSAMPLING:
+        save_kwargs["subsampling"] = _AVIF_SUBSAMPLING[subsampling]
+    if threads is not None:
+        save_kwargs["max_threads"] = threads
+    return save_kwargs
+
+
+# Format-specific save arguments for image-to-image conversion
+_SAVE_KWARGS = {
+    "jpeg": lambda quality, optimize, progressive, subsampling, **_: {
+        "quality": quality,
+        "optimize": optimize,
+        "progressive": progressive,
+        "subsampling": subsampling,
+    },
+    "png": lambda optimize, **_: {"optimize": optimize},
+    "webp": lambda quality, optimize, webp_method, webp_lossless, **_: {
+        "quality": quality,
+        "optimize": optimize,
+        "method": webp_method,
+        "lossless": webp_lossless,
+    },
+    "tiff": lambda tiff_compression, **_: {
+        "compression": _TIFF_COMPRESSION[tiff_compression],
+    },
+    "avif": _avif_save_kwargs,
+    "gif": lambda optimize, **_: {"optimize": optimize},
+}
+
+# Inputs at least this many megapixels use libvips with --backend auto
+VIPS_THRESHOLD_MP = 20
+
+# libvips savers for image-to-image conversion, keyed by output format
+_VIPS_SAVERS = {
+    "jpeg": lambda img, path, quality, optimize, **_: img.jpegsave(
+        path, Q=quality, optimize_coding=optimize
+    ),
+    "png": lambda img, path, optimize, **_: img.pngsave(
+        path, compression=9 if optimize else 6
+    ),
+    "webp": lambda img, path, quality, webp_method, webp_lossless, **_: img.webpsave(
+        path, Q=quality, effort=webp_method, lossless=webp_lossless
+    ),
+    "tiff": lambda img, path, tiff_compression, **_: img.tiffsave(
+        path, compression=tiff_compression
+    ),
+    "avif": lambda img, path, quality, **_: img.heifsave(
+        path, Q=quality, compression="av1"
+    ),
+}
+
+# Options that change the output when set away from their defaults; with
+# all of them at their default a same-format input is copied as-is
+_REENCODE_OPTIONS = (
+    "quality",
+    "width",
+    "height",
+    "max_size",
+    "optimize",
+    "webp_method",
+    "webp_lossless",
+    "tiff_compression",
+    "progressive",
+    "subsampling",
+    "avif_speed",
+    "palette",
+)
+
+# Options only the Pillow backend honours; libvips would drop them
+_PILLOW_ONLY_OPTIONS = (
+    "progressive",
+    "subsampling",
+    "palette",
+    "resample",
+    "avif_speed",
+    "threads",
+)
+
+# Output formats Pillow can write as multi-frame animations
+_ANIMATED_FORMATS = frozenset({"gif", "webp", "png", "tiff", "avif"})
+
+# Embed formats that can store a palette image without expanding it back
+# to full color
+_PALETTE_FORMATS = frozenset({"PNG", "GIF", "BMP", "TIFF", "WEBP"})
+
+# SVG markup surrounding an embedded image's base64 payload
+_SVG_EMBED_PREFIX = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<svg xmlns="http://www.w3.org/2000/svg"\n'
+    '     xmlns:xlink="http://www.w3.org/1999/xlink"\n'
+    '     width="{w}"\n'
+    '     height="{h}"\n'
+    '     viewBox="0 0 {w} {h}">{bg_rect}'
+    '\n  <image x="0" y="0"\n'
+    '         width="{w}"\n'
+    '         height="{h}"\n'
+    '         href="data:{mime};base64,'
+)
+_SVG_EMBED_SUFFIX = '"/>\n</svg>'
+_SVG_TRACE_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<svg xmlns="http://www.w3.org/2000/svg"\n'
+    '     width="{w}"\n'
+    '     height="{h}"\n'
+    '     viewBox="0 0 {w} {h}">\n'
+    '  <path fill="black" fill-rule="evenodd" d="{d}"/>\n'
+    "</svg>\n"
+)
+
+# Map format names to Pillow format strings
+_PILLOW_FORMAT = {
+    "jpeg": "JPEG",
+    "png": "PNG",
+    "webp": "WEBP",
+    "tiff": "TIFF",
+    "bmp": "BMP",
+    "gif": "GIF",
+    "avif": "AVIF",
+    "heif": "HEIF",
+    "ico": "ICO",
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser once per process."""
     parser = argparse.ArgumentParser(
         description=(
             "Convert between various image formats. "
@@ -29,14 +353,48 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "input_path",
         type=Path,
-        help="Path to the input image file (supports JPEG, PNG, WebP, TIFF, "
-        "BMP, GIF, AVIF, HEIF, ICO, etc.)",
+        nargs="*",
+        help="Path(s) to the input image file(s) (supports JPEG, PNG, WebP, "
+        "TIFF, BMP, GIF, AVIF, HEIF, ICO, etc.), or directories whose images "
+        "are all converted in batch mode",
     )
 
     parser.add_argument(
         "output_path",
         type=Path,
-        help="Path to save the converted file (format auto-detected from extension)",
+        help=(
+            "Path to save the converted file (format auto-detected from extension), "
+            "or a directory when converting multiple inputs"
+        ),
+    )
+
+    parser.add_argument(
+        "--glob",
+        metavar="PATTERN",
+        help=(
+            "Also convert every file matching PATTERN (e.g. 'icons/**/*.png') "
+            "in batch mode, with output_path as the destination directory"
+        ),
+    )
+
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Only report errors and the batch summary",
+    )
+
+    parser.add_argument(
+        "--codec-info",
+        action="store_true",
+        help="Report the JPEG codec Pillow is linked against before converting",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of parallel conversions in batch mode (default: CPU count)",
     )
 
     parser.add_argument(
@@ -71,7 +429,8 @@ def parse_args() -> argparse.Namespace:
         default="auto",
         help=(
             "Output format (default: auto - detect from file extension)\n"
-            "For SVG: use --method to choose embed or trace conversion"
+            "For SVG: use --method to choose embed or trace conversion;\n"
+            "embedded images default to lossless WebP"
         ),
     )
 
@@ -102,13 +461,23 @@ def parse_args() -> argparse.Namespace:
         help=("Maximum width or height " "(resizes proportionally)"),
     )
 
+    parser.add_argument(
+        "--resample",
+        choices=["lanczos", "bicubic", "bilinear"],
+        default="lanczos",
+        help=(
+            "Resampling filter used when resizing (default: lanczos)\n"
+            "bicubic and bilinear are faster at slightly lower quality"
+        ),
+    )
+
     parser.add_argument(
         "--background",
         default="transparent",
         help=(
             "Background color for the SVG "
             "(default: transparent)\n"
-            "Use 'transparent', hex colors like "
+            "Use 'transparent', 'none', 'currentColor', hex colors like "
             "'#FFFFFF', or CSS color names"
         ),
     )
@@ -116,7 +485,114 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--optimize",
         action="store_true",
-        help="Optimize the SVG output",
+        help=(
+            "Optimize the output encoding\n"
+            "For JPEG this computes optimal Huffman tables (optimize_coding)\n"
+            "For PNG this stores images with at most 256 colors as a palette"
+        ),
+    )
+
+    parser.add_argument(
+        "--backend",
+        choices=["auto", "pillow", "vips"],
+        default="auto",
+        help=(
+            "Image-to-image conversion backend (default: auto)\n"
+            "  pillow: always use Pillow\n"
+            "  vips: stream through libvips (needs pyvips), falls back to Pillow\n"
+            f"  auto: libvips for inputs of {VIPS_THRESHOLD_MP} MP or more, "
+            "when pyvips is installed\n"
+            "        and no Pillow-only option (--progressive, --subsampling,\n"
+            "        --palette, --resample, --avif-speed, --threads) is set"
+        ),
+    )
+
+    parser.add_argument(
+        "--progressive",
+        action="store_true",
+        help="Write progressive JPEGs, often smaller and better for the web",
+    )
+
+    parser.add_argument(
+        "--subsampling",
+        type=int,
+        choices=[0, 1, 2],
+        default=-1,
+        help=(
+            "JPEG and AVIF chroma subsampling: 0=4:4:4, 1=4:2:2, 2=4:2:0\n"
+            "(default: encoder default, 4:2:0)"
+        ),
+    )
+
+    parser.add_argument(
+        "--avif-speed",
+        type=int,
+        default=6,
+        choices=range(11),
+        help=(
+            "AVIF encoder speed (0-10, default: 6)\n"
+            "Higher is much faster at a small cost in size"
+        ),
+    )
+
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help=(
+            "Encoder threads per AVIF conversion (default: CPU count)\n"
+            "Lower it when running many batch --jobs"
+        ),
+    )
+
+    parser.add_argument(
+        "--webp-method",
+        type=int,
+        default=0,
+        choices=range(7),
+        help=(
+            "WebP encoder effort (0-6, default: 0)\n"
+            "0 is fastest, 6 gives the smallest files"
+        ),
+    )
+
+    parser.add_argument(
+        "--webp-lossless",
+        action="store_true",
+        help=(
+            "Use lossless WebP encoding\n"
+            "--quality then sets compression effort; combine with\n"
+            "--webp-method 6 for the smallest lossless files"
+        ),
+    )
+
+    parser.add_argument(
+        "--palette",
+        type=int,
+        metavar="N",
+        help=(
+            "Quantize embedded images and PNG output to N colors (2-256)\n"
+            "Shrinks icon-like images considerably"
+        ),
+    )
+
+    parser.add_argument(
+        "--tiff-compression",
+        choices=["zstd", "deflate", "lzw", "none"],
+        default="zstd",
+        help=(
+            "TIFF compression (default: zstd)\n"
+            "Falls back to deflate if libtiff lacks zstd support"
+        ),
+    )
+
+    parser.add_argument(
+        "--force-reencode",
+        action="store_true",
+        help=(
+            "Decode and re-encode even when the input already has the output\n"
+            "format and no option changes it (default: copy the file, or\n"
+            "embed its bytes as-is for --method embed)"
+        ),
     )
 
     parser.add_argument(
@@ -136,28 +612,52 @@ def parse_args() -> argparse.Namespace:
         ),
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--mkbitmap",
+        action="store_true",
+        help=(
+            "Highpass filter the bitmap before potrace tracing, as mkbitmap\n"
+            "does; cleaner input traces faster into smaller SVGs\n"
+            "Uses a built-in filter if mkbitmap is not installed"
+        ),
+    )
+
+    parser.add_argument(
+        "--trace-backend",
+        choices=["potrace", "vtracer"],
+        default="potrace",
+        help=(
+            "Vector tracing backend (only with --method trace)\n"
+            "  potrace: 1-bit black and white tracing (default)\n"
+            "  vtracer: color tracing, falls back to potrace if unavailable"
+        ),
+    )
+
+    return parser
+
+
+def parse_args() -> argparse.Namespace:
+    return _build_parser().parse_args()
+
+
+@functools.lru_cache(maxsize=4)
+def _parser_defaults(names: tuple[str, ...]) -> dict:
+    """Look up the parser defaults of the named options."""
+    parser = _build_parser()
+    return {name: parser.get_default(name) for name in names}
+
+
+def changed_options(args: argparse.Namespace, names: tuple[str, ...]) -> list[str]:
+    """List the named options that are set away from their defaults."""
+    return [
+        name
+        for name, default in _parser_defaults(names).items()
+        if getattr(args, name) != default
+    ]
 
 
 def detect_output_format(output_path: Path, format_arg: str) -> str:
     """Detect output format from file extension or format argument."""
-    # Map file extensions to formats
-    ext_to_format = {
-        ".jpg": "jpeg",
-        ".jpeg": "jpeg",
-        ".png": "png",
-        ".webp": "webp",
-        ".tiff": "tiff",
-        ".tif": "tiff",
-        ".bmp": "bmp",
-        ".gif": "gif",
-        ".avif": "avif",
-        ".heif": "heif",
-        ".heic": "heif",
-        ".ico": "ico",
-        ".svg": "svg",
-    }
-
     ext = output_path.suffix.lower()
 
     # SVG extension always takes precedence
@@ -169,8 +669,9 @@ def detect_output_format(output_path: Path, format_arg: str) -> str:
         return format_arg.lower()
 
     # Use extension-based detection
-    if ext in ext_to_format:
-        return ext_to_format[ext]
+    fmt = _EXT_TO_FORMAT.get(ext)
+    if fmt is not None:
+        return fmt
 
     # Default to PNG if extension not recognized
     print(f"Warning: Unknown extension '{ext}', defaulting to PNG format")
@@ -179,166 +680,407 @@ def detect_output_format(output_path: Path, format_arg: str) -> str:
 
 def get_pillow_format(format_name: str) -> str:
     """Get the Pillow format string for a given format name."""
-    format_map = {
-        "jpeg": "JPEG",
-        "png": "PNG",
-        "webp": "WEBP",
-        "tiff": "TIFF",
-        "bmp": "BMP",
-        "gif": "GIF",
-        "avif": "AVIF",
-        "heif": "HEIF",
-        "ico": "ICO",
-    }
-    return format_map.get(format_name, "PNG")
+    return _PILLOW_FORMAT.get(format_name, "PNG")
+
+
+def load_plugin(pil_format: str) -> None:
+    """Import only the Pillow plugin needed to open or save pil_format.
+
+    Using an explicit format that isn't registered yet makes Pillow
+    import every plugin, which dominates a single-image conversion.
+    """
+    plugin = _PLUGINS.get(pil_format)
+    if plugin is not None and pil_format not in Image.OPEN:
+        # Unavailable codecs are left to Pillow's full plugin scan
+        with contextlib.suppress(ImportError):
+            importlib.import_module(f"PIL.{plugin}")
+
+
+def jpeg_codec_info() -> str:
+    """Describe the JPEG codec Pillow is linked against."""
+    if features.check_feature("libjpeg_turbo"):
+        return f"libjpeg-turbo {features.version_feature('libjpeg_turbo')}"
+    # Reference IJG libjpeg has no SIMD DCT or color conversion kernels
+    return f"libjpeg {features.version('jpg')} (no SIMD)"
+
+
+def get_quantize_method(mode: str) -> Image.Quantize:
+    """Pick the best palette quantizer available for the given image mode."""
+    if HAS_LIBIMAGEQUANT:
+        return Image.Quantize.LIBIMAGEQUANT
+    # Median cut cannot handle an alpha channel
+    if mode == "RGBA":
+        return Image.Quantize.FASTOCTREE
+    return Image.Quantize.MEDIANCUT
+
+
+def palettize_png(
+    img: Image.Image, colors: int | None, optimize: bool
+) -> Image.Image:
+    """Reduce an RGB(A) image to a palette image for smaller PNG output."""
+    if img.mode not in ("RGB", "RGBA"):
+        return img
+    if colors:
+        return img.quantize(
+            colors,
+            method=get_quantize_method(img.mode),
+            dither=Image.Dither.FLOYDSTEINBERG,
+        )
+    if optimize and img.mode == "RGB":
+        # Median cut keeps every color exactly when there are few enough
+        found = img.getcolors(256)
+        if found is not None:
+            return img.quantize(
+                len(found),
+                method=Image.Quantize.MEDIANCUT,
+                dither=Image.Dither.NONE,
+            )
+    return img
+
+
+def _flatten_on_white(img: Image.Image) -> Image.Image:
+    """Composite an image onto a white background, dropping transparency."""
+    if img.mode in ("RGBA", "LA"):
+        # Many exporters write an alpha channel that is fully opaque
+        opaque = img.getchannel("A").getextrema()[0] == 255
+    else:
+        opaque = not img.has_transparency_data
+    if opaque:
+        # Nothing would show through, so skip allocating and compositing
+        return img.convert("RGB")
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    # Blend straight onto an RGB canvas, using the alpha band as the mask
+    bg = Image.new("RGB", img.size, (255, 255, 255))
+    bg.paste(img, mask=img)
+    return bg
+
+
+def _drop_transparency(img: Image.Image, mode: str) -> Image.Image:
+    """Flatten images that may carry transparency for JPEG and BMP."""
+    if mode in ("RGBA", "LA", "P"):
+        return _flatten_on_white(img)
+    return img
+
+
+def _limit_colors(img: Image.Image, mode: str) -> Image.Image:
+    """Quantize to a 256-color palette for GIF, keeping transparency."""
+    if mode in ("P", "L"):
+        return img
+    if mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA")
+        mode = "RGBA"
+    return img.quantize(colors=256, method=get_quantize_method(mode))
+
+
+def _expand_palette(img: Image.Image, mode: str) -> Image.Image:
+    """Expand palette images to RGBA for ICO."""
+    if mode == "P":
+        return img.convert("RGBA")
+    return img
+
+
+# Per-format preparation before saving, keyed by output format
+_PREPARE_FOR_FORMAT = {
+    "jpeg": _drop_transparency,
+    "bmp": _drop_transparency,
+    "gif": _limit_colors,
+    "ico": _expand_palette,
+}
 
 
 def prepare_image_for_format(img: Image.Image, output_format: str) -> Image.Image:
     """Prepare image for specific output format (handle transparency, etc.)."""
-    if output_format in ("jpeg", "bmp"):
-        # JPEG and BMP don't support transparency
-        if img.mode in ("RGBA", "LA", "P"):
-            # Create white background
-            if img.mode == "P":
-                img = img.convert("RGBA")
-
-            if img.mode in ("RGBA", "LA"):
-                bg = Image.new(
-                    "RGB",
-                    img.size,
-                    (255, 255, 255),
-                )
-                if img.mode == "RGBA":
-                    bg.paste(
-                        img,
-                        mask=img.getchannel("A"),
-                    )
-                else:  # LA
-                    bg.paste(
-                        img,
-                        mask=img.getchannel("A"),
-                    )
-                img = bg
-            else:
-                img = img.convert("RGB")
-    elif output_format == "gif":
-        # GIF supports transparency but limited colors
-        if img.mode not in ("P", "L"):
-            if img.mode == "RGBA":
-                # Convert RGBA to P with transparency
-                img = img.convert("P", palette=Image.ADAPTIVE)
-            else:
-                img = img.convert("P")
-    elif output_format == "ico":
-        # ICO format considerations
-        if img.mode == "P":
-            img = img.convert("RGBA")
+    prepare = _PREPARE_FOR_FORMAT.get(output_format)
+    if prepare is None:
+        return img
+    return prepare(img, img.mode)
 
-    return img
+
+def save_image(
+    img: Image.Image,
+    fp: Path | BinaryIO,
+    save_kwargs: dict,
+) -> None:
+    """Save image, falling back to deflate if libtiff lacks zstd support."""
+    start = None if isinstance(fp, Path) else fp.tell()
+    try:
+        img.save(fp, **save_kwargs)
+    except OSError:
+        if save_kwargs.get("compression") != "zstd":
+            raise
+        if start is not None:
+            # Drop whatever the failed attempt wrote to the stream
+            fp.seek(start)
+            fp.truncate()
+        save_kwargs["compression"] = "tiff_deflate"
+        img.save(fp, **save_kwargs)
+
+
+def get_save_kwargs(
+    output_format: str,
+    quality: int = 90,
+    optimize: bool = False,
+    webp_method: int = 0,
+    webp_lossless: bool = False,
+    tiff_compression: str = "zstd",
+    progressive: bool = False,
+    subsampling: int = -1,
+    avif_speed: int = 6,
+    threads: int | None = None,
+) -> dict:
+    """Build Pillow save arguments for an image-to-image conversion."""
+    save_kwargs = {"format": get_pillow_format(output_format)}
+    kwargs_for = _SAVE_KWARGS.get(output_format)
+    if kwargs_for is not None:
+        save_kwargs.update(
+            kwargs_for(
+                quality=quality,
+                optimize=optimize,
+                webp_method=webp_method,
+                webp_lossless=webp_lossless,
+                tiff_compression=tiff_compression,
+                progressive=progressive,
+                subsampling=subsampling,
+                avif_speed=avif_speed,
+                threads=threads,
+            )
+        )
+    return save_kwargs
+
+
+def open_image(
+    input_path: Path | BinaryIO,
+    image: Image.Image | None = None,
+) -> contextlib.AbstractContextManager[Image.Image]:
+    """Open input_path, or reuse an image the caller already opened."""
+    if image is not None:
+        # The caller keeps ownership, so don't close it on exit
+        return contextlib.nullcontext(image)
+    return Image.open(input_path)
+
+
+def frame_durations(img: Image.Image) -> list[int]:
+    """Read each frame's display duration, leaving img on its first frame."""
+    durations = []
+    for index in range(img.n_frames):
+        img.seek(index)
+        durations.append(img.info.get("duration", 0))
+    img.seek(0)
+    return durations
+
+
+def iter_frames(
+    img: Image.Image,
+    convert: Callable[[Image.Image], Image.Image],
+    start: int = 1,
+) -> Iterator[Image.Image]:
+    """Yield converted frames one at a time rather than copying them all."""
+    for index in range(start, img.n_frames):
+        img.seek(index)
+        frame = convert(img)
+        # The next seek reuses img, so hand out a detached frame
+        yield img.copy() if frame is img else frame
+
+
+def save_animated(
+    first: Image.Image,
+    source: Image.Image,
+    output_path: Path | BinaryIO,
+    save_kwargs: dict,
+    durations: list[int],
+    convert: Callable[[Image.Image], Image.Image],
+) -> None:
+    """Save an animation, converting the frames after the first lazily.
+
+    No Pillow encoder writes frames as it reads them; GIF too collects
+    every converted frame before writing, so peak memory is unchanged.
+    """
+    frames = iter_frames(source, convert)
+    if save_kwargs["format"] != "GIF":
+        # Only the GIF encoder reads append_images exactly once; the others
+        # list or re-walk it (and TIFF may be retried), so they need a list
+        frames = list(frames)
+
+    save_kwargs = {**save_kwargs, "save_all": True, "append_images": frames}
+    # One value is enough when every frame is shown for the same time
+    uniform = all(duration == durations[0] for duration in durations)
+    save_kwargs["duration"] = durations[0] if uniform else durations
+    if "loop" in source.info:
+        save_kwargs["loop"] = source.info["loop"]
+
+    save_image(first, output_path, save_kwargs)
+
+
+def display_name(target: Path | BinaryIO) -> str:
+    """Name a conversion input or output for the progress report."""
+    if isinstance(target, Path):
+        return target.name
+    # Real files know their path; in-memory streams have no name
+    name = getattr(target, "name", None)
+    return os.path.basename(name) if isinstance(name, str) else "<stream>"
 
 
 def convert_image_to_image(
-    input_path: Path,
-    output_path: Path,
+    input_path: Path | BinaryIO,
+    output_path: Path | BinaryIO,
     output_format: str,
     quality: int = 90,
     width: int | None = None,
     height: int | None = None,
     max_size: int | None = None,
     optimize: bool = False,
+    webp_method: int = 0,
+    webp_lossless: bool = False,
+    tiff_compression: str = "zstd",
+    resample: str = "lanczos",
+    progressive: bool = False,
+    subsampling: int = -1,
+    avif_speed: int = 6,
+    threads: int | None = None,
+    palette: int | None = None,
+    image: Image.Image | None = None,
 ) -> None:
-    """Convert image from one format to another."""
-    with Image.open(input_path) as img:
+    """Convert image from one format to another.
+
+    Paths may also be binary file objects, such as ``io.BytesIO``. Pass an
+    already-opened ``image`` to avoid reopening ``input_path``.
+    """
+    with open_image(input_path, image) as img:
         print(
             f"Input: {img.width}x{img.height}, Mode: {img.mode}, Format: {img.format}"
         )
 
-        # Resize if requested
-        if width or height or max_size:
-            img = resize_image(img, width, height, max_size)
+        # Keep every frame of an animation if the output supports it
+        animated = (
+            getattr(img, "n_frames", 1) > 1 and output_format in _ANIMATED_FORMATS
+        )
+        if animated:
+            durations = frame_durations(img)
+
+        # Decide once per conversion what each frame needs
+        size = get_resize_size(img.size, width, height, max_size)
+        if size is not None:
+            # Decode JPEGs at reduced scale before resampling
+            draft_image(img, size)
+        # Pillow decodes later GIF frames as RGB(A), so give a palette
+        # first frame the same mode for non-GIF encoders
+        widen_palette = animated and output_format != "gif"
+
+        def convert_frame(frame: Image.Image) -> Image.Image:
+            if widen_palette and frame.mode == "P":
+                frame = frame.convert(
+                    "RGBA" if "transparency" in frame.info else "RGB"
+                )
+            # Resize if requested
+            if size is not None:
+                frame = resample_image(frame, size, resample)
+            # Prepare image for target format
+            return prepare_image_for_format(frame, output_format)
+
+        source = img
+        img = convert_frame(img)
+        if animated and img is source:
+            # Saving the source itself with save_all would repeat its frames
+            img = source.copy()
+        if size is not None:
             print(f"Resized to: {img.width}x{img.height}")
-
-        # Prepare image for target format
-        img = prepare_image_for_format(img, output_format)
+        if output_format == "png" and not animated:
+            img = palettize_png(img, palette, optimize)
 
         # Set up save arguments
-        save_kwargs = {"format": get_pillow_format(output_format)}
-
-        if output_format == "jpeg":
-            save_kwargs["quality"] = quality
-            save_kwargs["optimize"] = optimize
-        elif output_format == "png":
-            save_kwargs["optimize"] = optimize
-        elif output_format == "webp":
-            save_kwargs["quality"] = quality
-            save_kwargs["optimize"] = optimize
-        elif output_format == "tiff":
-            save_kwargs["compression"] = "lzw"
-        elif output_format == "avif":
-            save_kwargs["quality"] = quality
-            save_kwargs["optimize"] = optimize
-        elif output_format == "gif":
-            save_kwargs["optimize"] = optimize
-
+        save_kwargs = get_save_kwargs(
+            output_format,
+            quality,
+            optimize,
+            webp_method,
+            webp_lossless,
+            tiff_compression,
+            progressive,
+            subsampling,
+            avif_speed,
+            threads,
+        )
         # Save the converted image
-        img.save(output_path, **save_kwargs)
+        if animated:
+            print(f"Frames: {len(durations)}")
+            save_animated(
+                img, source, output_path, save_kwargs, durations, convert_frame
+            )
+        else:
+            save_image(img, output_path, save_kwargs)
 
-        print(f"Converted {input_path.name} → {output_path.name}")
+        print(
+            f"Converted {display_name(input_path)} → {display_name(output_path)}"
+        )
         print(f"Output format: {output_format.upper()}")
         if output_format != "svg":
             print(f"Output size: {img.width}x{img.height}")
 
 
-def validate_input(input_path: Path) -> None:
-    """Validate the input file."""
-    if not input_path.exists():
-        print(f"Error: Input file does not exist: " f"{input_path}")
-        sys.exit(1)
+def sniff_format(input_path: Path) -> str | None:
+    """Identify common image formats from the file's magic bytes."""
+    with open(input_path, "rb") as f:
+        header = f.read(16)
+    for offset, magic, fmt in _MAGIC:
+        if header.startswith(magic, offset):
+            return fmt
+    return None
 
+
+def validate_input(input_path: Path) -> Image.Image:
+    """Validate the input file and return it opened for conversion.
+
+    The image is opened lazily, so only the header has been read. The
+    caller owns the returned image and must close it.
+    """
+    # One stat covers the common case; only a failure needs a second look
     if not input_path.is_file():
-        print(f"Error: Input path is not a file: " f"{input_path}")
+        if not input_path.exists():
+            print(f"Error: Input file does not exist: " f"{input_path}")
+        else:
+            print(f"Error: Input path is not a file: " f"{input_path}")
         sys.exit(1)
 
-    # Check if it's a valid image
+    # Check if it's a valid image. A recognised header lets Pillow try just
+    # that one plugin; anything else gets Pillow's full detection
+    fmt = sniff_format(input_path)
     try:
-        with Image.open(input_path) as img:
-            allowed_formats = [
-                "WEBP",
-                "PNG",
-                "JPEG",
-                "JPG",
-                "GIF",
-                "BMP",
-                "TIFF",
-                "TIF",
-                "AVIF",
-                "HEIF",
-                "HEIC",
-                "ICO",
-                "PCX",
-                "TGA",
-                "ICNS",
-                "PPM",
-                "PGM",
-                "PBM",
-                "XBM",
-                "XPM",
-            ]
-            if img.format not in allowed_formats:
-                print(f"Warning: Input format " f"'{img.format}' may not be supported")
+        if fmt is not None:
+            load_plugin(fmt)
+            img = Image.open(input_path, formats=[fmt])
+        else:
+            img = Image.open(input_path)
     except UnidentifiedImageError:
         print(f"Error: Cannot identify image file: " f"{input_path}")
         sys.exit(1)
 
+    if img.format not in _ALLOWED_FORMATS:
+        print(f"Warning: Input format " f"'{img.format}' may not be supported")
 
-def resize_image(
+    return img
+
+
+def resample_image(
     img: Image.Image,
+    size: tuple[int, int],
+    resample: str = "lanczos",
+) -> Image.Image:
+    """Resize image to an exact size with the given resampling filter."""
+    # For large downscales, Pillow first shrinks by an integer factor with
+    # reduce() to at least twice the target, as thumbnail() does, leaving
+    # only a small filter pass with near-identical output
+    return img.resize(size, _RESAMPLE_FILTERS[resample], reducing_gap=2.0)
+
+
+def get_resize_size(
+    size: tuple[int, int],
     width: int | None = None,
     height: int | None = None,
     max_size: int | None = None,
-) -> Image.Image:
-    """Resize image while preserving aspect ratio."""
-    orig_w, orig_h = img.size
+) -> tuple[int, int] | None:
+    """Compute the resized dimensions, or None if no resize is needed."""
+    orig_w, orig_h = size
 
     if max_size:
         # Scale down if either dimension exceeds max_size
@@ -347,77 +1089,133 @@ def resize_image(
                 max_size / orig_w,
                 max_size / orig_h,
             )
-            new_w = int(orig_w * ratio)
-            new_h = int(orig_h * ratio)
-            return img.resize(
-                (new_w, new_h),
-                Image.Resampling.LANCZOS,
-            )
+            # Keep at least one pixel along a very thin dimension
+            new_w = max(1, int(orig_w * ratio))
+            new_h = max(1, int(orig_h * ratio))
+            return new_w, new_h
 
     if width and height:
-        return img.resize(
-            (width, height),
-            Image.Resampling.LANCZOS,
-        )
+        return width, height
     elif width:
         ratio = width / orig_w
-        new_h = int(orig_h * ratio)
-        return img.resize(
-            (width, new_h),
-            Image.Resampling.LANCZOS,
-        )
+        new_h = max(1, int(orig_h * ratio))
+        return width, new_h
     elif height:
         ratio = height / orig_h
-        new_w = int(orig_w * ratio)
-        return img.resize(
-            (new_w, height),
-            Image.Resampling.LANCZOS,
-        )
+        new_w = max(1, int(orig_w * ratio))
+        return new_w, height
 
-    return img
+    return None
+
+
+def draft_image(img: Image.Image, size: tuple[int, int]) -> None:
+    """Let libjpeg scale a not-yet-loaded JPEG down while decoding."""
+    if img.format == "JPEG":
+        # Picks the largest 1/2, 1/4 or 1/8 DCT scale still >= size
+        img.draft(img.mode, size)
+
+
+def resize_image(
+    img: Image.Image,
+    width: int | None = None,
+    height: int | None = None,
+    max_size: int | None = None,
+    resample: str = "lanczos",
+) -> Image.Image:
+    """Resize image while preserving aspect ratio."""
+    size = get_resize_size(img.size, width, height, max_size)
+    if size is None:
+        return img
+    return resample_image(img, size, resample)
 
 
-def image_to_base64(img: Image.Image, fmt: str, quality: int = 90) -> str:
-    """Convert PIL Image to base64 encoded string."""
-    buffer = io.BytesIO()
+def prepare_embed_image(
+    img: Image.Image,
+    fmt: str,
+    quality: int = 90,
+    webp_method: int = 0,
+    webp_lossless: bool = False,
+    tiff_compression: str = "zstd",
+    palette: int | None = None,
+) -> tuple[Image.Image, dict]:
+    """Prepare an image and its save arguments for embedding in an SVG."""
+    pil_format = fmt.upper()
+
+    # JPEG and BMP don't support transparency, convert RGBA to RGB
+    if pil_format in ("JPEG", "BMP") and img.mode in ("RGBA", "LA"):
+        img = _flatten_on_white(img)
+
+    # Fewer distinct colors filter and deflate much better
+    if palette and pil_format in _PALETTE_FORMATS:
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        img = img.quantize(
+            colors=palette,
+            method=get_quantize_method(img.mode),
+            dither=Image.Dither.FLOYDSTEINBERG,
+        )
 
     # Handle format-specific options
-    save_kwargs = {"format": fmt.upper()}
-
-    if fmt.upper() == "JPEG":
-        # Convert RGBA to RGB for JPEG
-        if img.mode in ("RGBA", "LA"):
-            bg = Image.new("RGB", img.size, (255, 255, 255))
-            if img.mode == "RGBA":
-                bg.paste(img, mask=img.getchannel("A"))
-            else:
-                bg.paste(img, mask=img.getchannel("A"))
-            img = bg
-        save_kwargs["quality"] = quality
-        save_kwargs["optimize"] = True
-    elif fmt.upper() == "PNG":
-        save_kwargs["optimize"] = True
-    elif fmt.upper() == "WEBP":
-        save_kwargs["quality"] = quality
-        save_kwargs["optimize"] = True
-    elif fmt.upper() == "TIFF":
-        save_kwargs["compression"] = "lzw"
-    elif fmt.upper() == "BMP":
-        # BMP doesn't support transparency, convert RGBA to RGB
-        if img.mode in ("RGBA", "LA"):
-            bg = Image.new("RGB", img.size, (255, 255, 255))
-            if img.mode == "RGBA":
-                bg.paste(img, mask=img.getchannel("A"))
-            else:
-                bg.paste(img, mask=img.getchannel("A"))
-            img = bg
-    elif fmt.upper() == "AVIF":
-        save_kwargs["quality"] = quality
-        save_kwargs["optimize"] = True
+    save_kwargs = {"format": pil_format}
+    kwargs_for = _EMBED_SAVE_KWARGS.get(pil_format)
+    if kwargs_for is not None:
+        save_kwargs.update(
+            kwargs_for(
+                quality=quality,
+                webp_method=webp_method,
+                webp_lossless=webp_lossless,
+                tiff_compression=tiff_compression,
+            )
+        )
+
+    return img, save_kwargs
+
+
+def image_to_base64(
+    img: Image.Image,
+    fmt: str,
+    quality: int = 90,
+    webp_method: int = 0,
+    webp_lossless: bool = False,
+    tiff_compression: str = "zstd",
+    palette: int | None = None,
+    buffer: io.BytesIO | None = None,
+) -> str:
+    """Convert PIL Image to base64 encoded string.
+
+    Pass a ``buffer`` to reuse it across calls instead of allocating one.
+    """
+    if buffer is None:
+        buffer = io.BytesIO()
+    else:
+        buffer.seek(0)
+        buffer.truncate()
+    img, save_kwargs = prepare_embed_image(
+        img, fmt, quality, webp_method, webp_lossless, tiff_compression, palette
+    )
+    save_image(img, buffer, save_kwargs)
+    # Encode from a view of the buffer rather than a copy of its contents;
+    # release it so a reused buffer can be truncated again
+    with buffer.getbuffer() as img_data:
+        return b64encode_str(img_data)
 
-    img.save(buffer, **save_kwargs)
-    img_data = buffer.getvalue()
-    return base64.b64encode(img_data).decode("utf-8")
+
+def embedded_svg_parts(w: int, h: int, fmt: str, bg: str) -> tuple[str, str]:
+    """Build the SVG markup that surrounds the base64 image payload."""
+    # Determine MIME type
+    mime = _MIME_TYPES.get(fmt.lower(), "image/png")
+
+    # Add background if specified
+    bg_rect = (
+        f'\n  <rect width="100%" height="100%" fill="{bg}"/>'
+        if bg and bg.lower() != "transparent"
+        else ""
+    )
+
+    # Create SVG content up to the start of the embedded image data
+    svg = _SVG_EMBED_PREFIX.format(w=w, h=h, bg_rect=bg_rect, mime=mime)
+
+    return svg, _SVG_EMBED_SUFFIX
 
 
 def create_embedded_svg(
@@ -426,71 +1224,302 @@ def create_embedded_svg(
     quality: int,
     bg: str,
     optimize: bool,
+    webp_method: int = 0,
+    webp_lossless: bool = False,
+    tiff_compression: str = "zstd",
+    palette: int | None = None,
 ) -> str:
     """Create SVG with embedded raster image."""
     w, h = img.size
 
     # Get base64 encoded image
-    b64_data = image_to_base64(img, fmt, quality)
+    b64_data = image_to_base64(
+        img, fmt, quality, webp_method, webp_lossless, tiff_compression, palette
+    )
 
-    # Determine MIME type
-    mime_types = {
-        "png": "image/png",
-        "jpeg": "image/jpeg",
-        "webp": "image/webp",
-        "tiff": "image/tiff",
-        "bmp": "image/bmp",
-        "avif": "image/avif",
-    }
-    mime = mime_types.get(fmt.lower(), "image/png")
+    prefix, suffix = embedded_svg_parts(w, h, fmt, bg)
+    # Single join so the multi-MB payload is copied only once
+    return "".join((prefix, b64_data, suffix))
 
-    # Create SVG content
-    svg = (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<svg xmlns="http://www.w3.org/2000/svg"\n'
-        '     xmlns:xlink="http://www.w3.org/1999/xlink"\n'
-        f'     width="{w}"\n'
-        f'     height="{h}"\n'
-        f'     viewBox="0 0 {w} {h}">'
-    )
 
-    # Add background if specified
-    if bg and bg.lower() != "transparent":
-        svg += f'\n  <rect width="100%" height="100%" ' f'fill="{bg}"/>'
+def copy_base64(src: BinaryIO, dst: BinaryIO) -> None:
+    """Base64-encode everything read from src into dst."""
+    # Multiples of 3 bytes encode without padding mid-stream, and the
+    # ASCII output goes straight to disk without a str round-trip.
+    # Reading into one reused buffer avoids a new bytes object per chunk
+    chunk = bytearray(EMBED_CHUNK_SIZE)
+    view = memoryview(chunk)
+    while n := src.readinto(chunk):
+        dst.write(base64.b64encode(view[:n]))
+
+
+@contextlib.contextmanager
+def atomic_write(output_path: Path) -> Iterator[BinaryIO]:
+    """Write beside output_path, moving the file into place on success.
+
+    A failure part way leaves no truncated file and any previous output
+    untouched.
+    """
+    part_path = output_path.with_name(f".{output_path.name}.part")
+    try:
+        with open(part_path, "wb") as f:
+            yield f
+        os.replace(part_path, output_path)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
 
-    # Add the embedded image
-    svg += (
-        f'\n  <image x="0" y="0"\n'
-        f'         width="{w}"\n'
-        f'         height="{h}"\n'
-        f'         href="data:{mime};base64,{b64_data}"/>\n'
-        "</svg>"
+
+def write_embedded_svg(
+    img: Image.Image,
+    fmt: str,
+    quality: int,
+    bg: str,
+    optimize: bool,
+    output_path: Path,
+    webp_method: int = 0,
+    webp_lossless: bool = False,
+    tiff_compression: str = "zstd",
+    palette: int | None = None,
+) -> None:
+    """Write SVG with embedded raster image, overlapping encode and output.
+
+    An encoder thread saves the image into a pipe while this thread
+    base64-encodes the stream and writes it to the SVG file. Pillow
+    releases the GIL while encoding, so the two stages run concurrently.
+    """
+    w, h = img.size
+    img, save_kwargs = prepare_embed_image(
+        img, fmt, quality, webp_method, webp_lossless, tiff_compression, palette
     )
+    prefix, suffix = embedded_svg_parts(w, h, fmt, bg)
+
+    read_fd, write_fd = os.pipe()
+    errors: list[BaseException] = []
+
+    def encode() -> None:
+        try:
+            with os.fdopen(write_fd, "wb") as pipe:
+                if save_kwargs["format"] in _STREAMABLE_FORMATS:
+                    img.save(pipe, **save_kwargs)
+                else:
+                    # The encoder needs a seekable file, so buffer it first
+                    buffer = io.BytesIO()
+                    save_image(img, buffer, save_kwargs)
+                    pipe.write(buffer.getbuffer())
+        except BaseException as e:
+            errors.append(e)
+
+    pipe = os.fdopen(read_fd, "rb")
+    encoder = threading.Thread(target=encode, daemon=True)
+    encoder.start()
+    try:
+        # The closing tag is written even if encoding fails, so only keep
+        # the SVG once the encoder is known to have succeeded
+        with atomic_write(output_path) as f:
+            try:
+                with pipe:
+                    f.write(prefix.encode("utf-8"))
+                    copy_base64(pipe, f)
+                    f.write(suffix.encode("utf-8"))
+            finally:
+                encoder.join()
+
+            if errors:
+                raise errors[0]
+    finally:
+        # Unblocks the encoder if the output file could not be opened
+        pipe.close()
+        encoder.join()
+
+
+def write_passthrough_svg(
+    input_path: Path,
+    size: tuple[int, int],
+    fmt: str,
+    bg: str,
+    output_path: Path,
+) -> None:
+    """Write SVG embedding the input file's bytes as-is, without re-encoding."""
+    w, h = size
+    prefix, suffix = embedded_svg_parts(w, h, fmt, bg)
+
+    with open(input_path, "rb") as src, atomic_write(output_path) as f:
+        f.write(prefix.encode("utf-8"))
+        copy_base64(src, f)
+        f.write(suffix.encode("utf-8"))
+
+
+def grayscale_image(img: Image.Image) -> Image.Image:
+    """Convert image to grayscale, without copying one that already is."""
+    if img.mode == "L":
+        return img
+    return img.convert("L")
+
+
+def binarize_image(img: Image.Image) -> Image.Image:
+    """Convert image to 1-bit black and white for potrace."""
+    if img.mode != "1":
+        img = grayscale_image(img)  # Grayscale first
+        img = img.point(_THRESHOLD_LUT, "1")
+    return img
+
 
-    return svg
+def highpass_bitmap(img: Image.Image) -> Image.Image:
+    """Highpass filter and threshold an image to 1-bit, like mkbitmap."""
+    gray = grayscale_image(img)
+    background = gray.filter(ImageFilter.GaussianBlur(_MKBITMAP_RADIUS))
+    # Subtract the local background, re-centred on mid-grey
+    highpass = ImageChops.subtract(gray, background, offset=128)
+    return highpass.point(_MKBITMAP_LUT, "1")
+
+
+def convert_image_to_embedded_svg(
+    input_path: Path,
+    output_path: Path,
+    fmt: str = "png",
+    quality: int = 90,
+    bg: str = "transparent",
+    width: int | None = None,
+    height: int | None = None,
+    max_size: int | None = None,
+    optimize: bool = False,
+    webp_method: int = 0,
+    webp_lossless: bool = False,
+    tiff_compression: str = "zstd",
+    resample: str = "lanczos",
+    palette: int | None = None,
+    copy_input: bool = False,
+    image: Image.Image | None = None,
+) -> None:
+    """Convert image to an SVG with the raster data embedded.
+
+    Runs as one pass: JPEG draft decode, resize, then encode streamed
+    through base64 straight into the output file. With ``copy_input``, an
+    input already in ``fmt`` is embedded byte for byte instead.
+    """
+    with open_image(input_path, image) as img:
+        print(
+            f"Original: {img.width}x{img.height}, Mode: {img.mode}, Format: {img.format}"
+        )
+
+        # Resize if requested
+        size = get_resize_size(img.size, width, height, max_size)
+        if size is not None:
+            # Decode JPEGs at reduced scale before resampling
+            draft_image(img, size)
+            img = resample_image(img, size, resample)
+            print(f"Resized to: {img.width}x{img.height}")
+
+        if (
+            copy_input
+            and size is None
+            and not palette
+            and img.format == get_pillow_format(fmt)
+        ):
+            # Input is already encoded in the embed format, so skip the
+            # decode/re-encode round trip and embed the original bytes
+            write_passthrough_svg(input_path, img.size, fmt, bg, output_path)
+        else:
+            # Create SVG with embedded image
+            write_embedded_svg(
+                img,
+                fmt,
+                quality,
+                bg,
+                optimize,
+                output_path,
+                webp_method,
+                webp_lossless,
+                tiff_compression,
+                palette,
+            )
+
+        print(f"Converted {input_path.name} → {output_path.name}")
+        print(f"Method: Embedded {fmt.upper()}")
+        print(f"SVG size: {img.width}x{img.height}")
+
+
+@functools.lru_cache(maxsize=1)
+def _potrace_path() -> str | None:
+    """Locate the potrace executable once per process."""
+    return shutil.which("potrace")
+
+
+@functools.lru_cache(maxsize=1)
+def _mkbitmap_path() -> str | None:
+    """Locate the mkbitmap executable once per process."""
+    return shutil.which("mkbitmap")
+
+
+@functools.lru_cache(maxsize=1)
+def _potrace_binding():
+    """Import the pypotrace libpotrace bindings once per process, if present."""
+    try:
+        # The pure Python potracer port shares the module name but is
+        # slower than the potrace binary, so require the C extension
+        import potrace._potrace  # noqa: F401
+    except ImportError:
+        return None
+    return potrace
+
+
+def write_potrace_svg(bitmap: Image.Image, output_path: Path) -> None:
+    """Trace a 1-bit bitmap in-process with pypotrace and write the SVG."""
+    import numpy
+
+    def point(p: tuple[float, float]) -> str:
+        return f"{p[0]:g},{p[1]:g}"
+
+    # potrace traces the set pixels, which are the black ones here
+    path = _potrace_binding().Bitmap(numpy.asarray(bitmap) == 0).trace()
+    d = []
+    for curve in path:
+        d.append(f"M{point(curve.start_point)}")
+        for segment in curve:
+            if segment.is_corner:
+                d.append(f"L{point(segment.c)}L{point(segment.end_point)}")
+            else:
+                d.append(
+                    f"C{point(segment.c1)} {point(segment.c2)} "
+                    f"{point(segment.end_point)}"
+                )
+        d.append("z")
+
+    w, h = bitmap.size
+    output_path.write_text(_SVG_TRACE_TEMPLATE.format(w=w, h=h, d="".join(d)))
 
 
 def create_traced_svg(
     input_path: Path,
     output_path: Path,
     trace_opts: str,
+    preprocess: bool = False,
+    image: Image.Image | None = None,
 ) -> bool:
     """Create SVG using potrace for vector tracing."""
     try:
-        import subprocess
-        import tempfile
+        mkbitmap = _mkbitmap_path() if preprocess else None
+        # The bindings take no CLI options and cannot chain mkbitmap, so
+        # only skip the subprocess when neither was asked for
+        if not trace_opts and mkbitmap is None and _potrace_binding():
+            with open_image(input_path, image) as img:
+                if preprocess:
+                    bitmap = highpass_bitmap(img)
+                else:
+                    bitmap = binarize_image(img)
+            try:
+                write_potrace_svg(bitmap, output_path)
+            except Exception as e:
+                print(f"pypotrace tracing failed: {e}")
+                print("Falling back to the potrace executable...")
+            else:
+                print(f"Successfully traced to SVG: {output_path}")
+                return True
 
         # Check if potrace is available
-        try:
-            subprocess.run(
-                ["potrace", "--version"],
-                capture_output=True,
-                check=True,
-            )
-        except (
-            subprocess.CalledProcessError,
-            FileNotFoundError,
-        ):
+        potrace = _potrace_path()
+        if potrace is None:
             print("Error: potrace is not installed or not in PATH")
             print("Install potrace to use vector tracing:")
             print("  Ubuntu/Debian: sudo apt-get install potrace")
@@ -498,195 +1527,526 @@ def create_traced_svg(
             print("  Windows: Download from http://potrace.sourceforge.net/")
             return False
 
-        # Convert input to bitmap format
-        # that potrace can handle
-        with tempfile.NamedTemporaryFile(suffix=".pbm", delete=False) as temp_pbm:
-            temp_pbm_path = Path(temp_pbm.name)
+        # Convert input to a bitmap that potrace can handle
+        with open_image(input_path, image) as img:
+            if mkbitmap is not None:
+                # mkbitmap filters and thresholds a grayscale PGM itself
+                bitmap = grayscale_image(img)
+            elif preprocess:
+                bitmap = highpass_bitmap(img)
+            else:
+                # Convert to 1-bit black and white
+                bitmap = binarize_image(img)
+
+        # Run potrace
+        cmd = [
+            potrace,
+            "-s",
+        ]  # -s for SVG output
+
+        if trace_opts:
+            # Parse trace options
+            cmd.extend(trace_opts.split())
+
+        # No input file argument: potrace reads the bitmap from stdin
+        # and writes the SVG straight to output_path itself
+        cmd.extend(["-o", str(output_path)])
+
+        # Optionally chain mkbitmap in front of potrace: PGM in, PBM out
+        filter_proc = None
+        if mkbitmap is not None:
+            filter_proc = subprocess.Popen(
+                # mkbitmap upscales 2x by default; keep the input's size so
+                # the SVG matches the other trace paths
+                [mkbitmap, "-s", "1", "-t", str(_MKBITMAP_THRESHOLD)],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
 
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if filter_proc is None else filter_proc.stdout,
+            stderr=subprocess.PIPE,
+        )
+        procs = [proc]
+        if filter_proc is not None:
+            # potrace now holds the read end of the mkbitmap pipe
+            filter_proc.stdout.close()
+            procs.append(filter_proc)
+
+        # Stream the bitmap into the pipe instead of buffering it in memory
+        write_error = None
         try:
-            # Convert to PBM using PIL
-            with Image.open(input_path) as img:
-                # Convert to 1-bit black and white
-                if img.mode != "1":
-                    img = img.convert("L")  # Grayscale first
-                    img = img.point(
-                        lambda x: (0 if x < 128 else 255),
-                        "1",
-                    )
+            bitmap.save(procs[-1].stdin, "PPM")
+        except OSError as e:
+            # Usually potrace exited early; its stderr explains why
+            write_error = e
+        except BaseException:
+            for p in procs:
+                p.kill()
+                p.wait()
+            raise
+
+        if filter_proc is not None:
+            with contextlib.suppress(OSError):
+                filter_proc.stdin.close()
+            filter_proc.wait()
+
+        _, stderr = proc.communicate()
+
+        if proc.returncode != 0:
+            print(f"Error running potrace: {stderr.decode(errors='replace')}")
+            return False
 
-                img.save(temp_pbm_path, "PPM")
+        if write_error is not None:
+            raise write_error
 
-            # Run potrace
-            cmd = [
-                "potrace",
-                "-s",
-            ]  # -s for SVG output
+        print(f"Successfully traced to SVG: {output_path}")
+        return True
 
-            if trace_opts:
-                # Parse trace options
-                cmd.extend(trace_opts.split())
+    except Exception as e:
+        print(f"Error during tracing: {e}")
+        return False
 
-            cmd.extend(
-                [
-                    "-o",
-                    str(output_path),
-                    str(temp_pbm_path),
-                ]
-            )
 
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-            )
+def create_vtraced_svg(input_path: Path, output_path: Path) -> bool:
+    """Create SVG using vtracer for color vector tracing."""
+    try:
+        import vtracer
+    except ImportError:
+        print("Error: vtracer is not installed")
+        print("Install the vtracer Python package to use color tracing:")
+        print("  pip install vtracer")
+        return False
 
-            if result.returncode != 0:
-                print(f"Error running potrace: {result.stderr}")
-                return False
+    try:
+        # Traces the color image in-process, no binarization or subprocess
+        vtracer.convert_image_to_svg_py(
+            str(input_path),
+            str(output_path),
+            colormode="color",
+        )
+    except Exception as e:
+        print(f"Error during tracing: {e}")
+        return False
 
-            print(f"Successfully traced to SVG: {output_path}")
-            return True
+    print(f"Successfully traced to SVG: {output_path}")
+    return True
 
-        finally:
-            # Clean up temporary file
-            if temp_pbm_path.exists():
-                temp_pbm_path.unlink()
 
-    except ImportError:
-        print("Error: subprocess module not available")
+def can_copy_input(
+    args: argparse.Namespace, img: Image.Image, output_format: str
+) -> bool:
+    """Check whether re-encoding the input would leave it effectively unchanged."""
+    if args.force_reencode or img.format != get_pillow_format(output_format):
         return False
-    except Exception as e:
-        print(f"Error during tracing: {e}")
+    return not changed_options(args, _REENCODE_OPTIONS)
+
+
+def use_vips_backend(
+    args: argparse.Namespace, img: Image.Image, output_format: str
+) -> bool:
+    """Decide whether an image-to-image conversion should go through libvips."""
+    if output_format not in _VIPS_SAVERS or getattr(img, "n_frames", 1) > 1:
         return False
+    if args.backend == "auto":
+        # Output must not depend on image size or on pyvips being installed
+        if changed_options(args, _PILLOW_ONLY_OPTIONS):
+            return False
+        return img.width * img.height >= VIPS_THRESHOLD_MP * 1_000_000
+    return args.backend == "vips"
 
 
-def get_file_size_info(input_path: Path, output_path: Path) -> None:
-    """Print file size comparison."""
-    if input_path.exists() and output_path.exists():
+def convert_image_with_vips(
+    input_path: Path,
+    output_path: Path,
+    output_format: str,
+    quality: int = 90,
+    width: int | None = None,
+    height: int | None = None,
+    max_size: int | None = None,
+    optimize: bool = False,
+    webp_method: int = 0,
+    webp_lossless: bool = False,
+    tiff_compression: str = "zstd",
+) -> bool:
+    """Convert image with libvips' streaming, multithreaded pipeline.
+
+    Returns False when pyvips is unavailable, so the caller can use Pillow.
+    """
+    try:
+        import pyvips
+    except ImportError:
+        return False
+
+    # libvips decodes in strips on worker threads instead of loading the
+    # whole raster, so memory stays flat for very large inputs
+    img = pyvips.Image.new_from_file(str(input_path), access="sequential")
+    print(f"Input: {img.width}x{img.height}, Bands: {img.bands} (libvips)")
+
+    size = get_resize_size((img.width, img.height), width, height, max_size)
+    if size is not None:
+        # thumbnail shrinks on load where the format allows it
+        img = pyvips.Image.thumbnail(
+            str(input_path), size[0], height=size[1], size="force"
+        )
+        print(f"Resized to: {img.width}x{img.height}")
+
+    if output_format == "jpeg" and img.hasalpha():
+        # JPEG doesn't support transparency, match Pillow's white background
+        img = img.flatten(background=[255] * (img.bands - 1))
+
+    _VIPS_SAVERS[output_format](
+        img,
+        str(output_path),
+        quality=quality,
+        optimize=optimize,
+        webp_method=webp_method,
+        webp_lossless=webp_lossless,
+        tiff_compression=tiff_compression,
+    )
+
+    print(f"Converted {input_path.name} → {output_path.name}")
+    print(f"Output format: {output_format.upper()}")
+    print(f"Output size: {img.width}x{img.height}")
+    return True
+
+
+def get_file_size_info(input_path: Path, output_path: Path) -> dict | None:
+    """Compare file sizes, or return None if either can't be measured."""
+    # One stat per file; a missing file simply skips the report
+    try:
         in_size = input_path.stat().st_size
         out_size = output_path.stat().st_size
-        ratio = out_size / in_size
+    except OSError:
+        return None
+
+    if not in_size:
+        return None
+    return {
+        "input_size": in_size,
+        "output_size": out_size,
+        "ratio": out_size / in_size,
+    }
 
-        print(f"Input size:  {in_size:,} bytes")
-        print(f"Output size: {out_size:,} bytes")
-        print(f"Size ratio:  {ratio:.2f}x", end="")
-        if ratio > 1:
-            print(f" ({(ratio-1)*100:.1f}% larger)")
-        else:
-            print(f" ({(1-ratio)*100:.1f}% smaller)")
 
+def _format_file_size_info(info: dict) -> str:
+    """Format a file size comparison for the conversion report."""
+    ratio = info["ratio"]
+    if ratio > 1:
+        change = f"{(ratio-1)*100:.1f}% larger"
+    else:
+        change = f"{(1-ratio)*100:.1f}% smaller"
+    return (
+        f"Input size:  {info['input_size']:,} bytes\n"
+        f"Output size: {info['output_size']:,} bytes\n"
+        f"Size ratio:  {ratio:.2f}x ({change})"
+    )
 
-def main() -> None:
-    args = parse_args()
 
-    # Validate arguments
-    if args.quality < 1 or args.quality > 100:
-        print("Error: quality must be between 1 and 100")
-        sys.exit(1)
+def print_file_size_info(input_path: Path, output_path: Path) -> None:
+    """Print file size comparison."""
+    info = get_file_size_info(input_path, output_path)
+    if info is not None:
+        print(_format_file_size_info(info))
+
+
+def batch_output_path(input_path: Path, output_dir: Path, format_arg: str) -> Path:
+    """Build the output path for an input file converted in batch mode."""
+    fmt = format_arg if format_arg != "auto" else "png"
+    return output_dir / f"{input_path.stem}.{fmt}"
 
-    # Validate input
-    validate_input(args.input_path)
 
+def convert_file(
+    args: argparse.Namespace,
+    input_path: Path,
+    output_path: Path,
+) -> None:
+    """Convert a single input file using the parsed command line options."""
+    # Collect the report and emit it in one write, so parallel batch
+    # workers don't contend for stdout or interleave line by line
+    report = io.StringIO()
+    ok = False
+    try:
+        with contextlib.redirect_stdout(report):
+            # Validate input, reusing the opened image for the conversion
+            with validate_input(input_path) as source:
+                convert_source(args, source, input_path, output_path)
+        ok = True
+    finally:
+        # --quiet only hides the report of a successful conversion
+        if not (args.quiet and ok):
+            sys.stdout.write(report.getvalue())
+
+
+def convert_source(
+    args: argparse.Namespace,
+    source: Image.Image,
+    input_path: Path,
+    output_path: Path,
+) -> None:
+    """Convert an opened input image using the parsed command line options."""
     # Create output directory if needed
-    output_dir = args.output_path.parent
+    output_dir = output_path.parent
     if not output_dir.exists():
         output_dir.mkdir(parents=True, exist_ok=True)
         print(f"Created output directory: {output_dir}")
 
     # Check if input and output are the same
-    if args.input_path.resolve() == args.output_path.resolve():
+    if input_path.resolve() == output_path.resolve():
         print("Error: Input and output paths cannot be the same")
         sys.exit(1)
 
     # Detect output format
-    output_format = detect_output_format(args.output_path, args.format)
+    output_format = detect_output_format(output_path, args.format)
+    method = args.method
 
     try:
         if output_format == "svg":
             # Handle SVG conversion
-            if args.method == "trace":
-                # Use potrace for vector tracing
-                success = create_traced_svg(
-                    args.input_path,
-                    args.output_path,
-                    args.trace_options,
-                )
+            if method == "trace":
+                success = False
+                if args.trace_backend == "vtracer":
+                    success = create_vtraced_svg(input_path, output_path)
+                    if not success:
+                        print("Falling back to potrace...")
+
+                if not success:
+                    # Use potrace for vector tracing
+                    success = create_traced_svg(
+                        input_path,
+                        output_path,
+                        args.trace_options,
+                        args.mkbitmap,
+                        source,
+                    )
                 if not success:
                     print("Falling back to embed method...")
-                    args.method = "embed"
+                    method = "embed"
                 else:
-                    print(f"Converted {args.input_path.name} → {args.output_path.name}")
+                    print(f"Converted {input_path.name} → {output_path.name}")
                     print("Method: Vector tracing")
-                    get_file_size_info(
-                        args.input_path,
-                        args.output_path,
+                    print_file_size_info(
+                        input_path,
+                        output_path,
                     )
                     return
 
-            if args.method == "embed":
-                # Load and process the image
-                with Image.open(args.input_path) as img:
-                    print(
-                        f"Original: {img.width}x{img.height}, Mode: {img.mode}, Format: {img.format}"
-                    )
-
-                    # Resize if requested
-                    if args.width or args.height or args.max_size:
-                        img = resize_image(
-                            img,
-                            args.width,
-                            args.height,
-                            args.max_size,
-                        )
-                        print(f"Resized to: {img.width}x{img.height}")
-
-                    # For SVG embedding, use format from args or default to PNG
-                    embed_format = args.format if args.format != "auto" else "png"
-                    if embed_format == "svg":
-                        embed_format = "png"  # Can't embed SVG in SVG
-
-                    # Create SVG with embedded image
-                    svg_content = create_embedded_svg(
-                        img,
-                        embed_format,
-                        args.quality,
-                        args.background,
-                        args.optimize,
-                    )
-
-                    # Write SVG file
-                    with open(
-                        args.output_path,
-                        "w",
-                        encoding="utf-8",
-                    ) as f:
-                        f.write(svg_content)
-
-                    print(f"Converted {args.input_path.name} → {args.output_path.name}")
-                    print(f"Method: Embedded {embed_format.upper()}")
-                    print(f"SVG size: {img.width}x{img.height}")
-                    get_file_size_info(
-                        args.input_path,
-                        args.output_path,
-                    )
+            if method == "embed":
+                # For SVG embedding, use format from args or default to
+                # lossless WebP, which is smaller than optimized PNG
+                embed_format = args.format
+                webp_lossless = args.webp_lossless
+                if embed_format in ("auto", "svg"):  # Can't embed SVG in SVG
+                    embed_format = "webp"
+                    webp_lossless = True
+                load_plugin(get_pillow_format(embed_format))
+
+                convert_image_to_embedded_svg(
+                    input_path,
+                    output_path,
+                    embed_format,
+                    args.quality,
+                    args.background,
+                    args.width,
+                    args.height,
+                    args.max_size,
+                    args.optimize,
+                    args.webp_method,
+                    webp_lossless,
+                    args.tiff_compression,
+                    args.resample,
+                    args.palette,
+                    # Encoder options only apply if the input is re-encoded
+                    can_copy_input(args, source, embed_format),
+                    source,
+                )
+                print_file_size_info(
+                    input_path,
+                    output_path,
+                )
         else:
             # Handle image-to-image conversion
+            if can_copy_input(args, source, output_format):
+                # Skip the decoder and encoder entirely
+                shutil.copyfile(input_path, output_path)
+                print("Copied (no re-encode needed)")
+                print_file_size_info(input_path, output_path)
+                return
+
+            if use_vips_backend(args, source, output_format):
+                ignored = changed_options(args, _PILLOW_ONLY_OPTIONS)
+                if ignored:
+                    flags = ", ".join(
+                        f"--{name.replace('_', '-')}" for name in ignored
+                    )
+                    print(f"Warning: libvips backend ignores {flags}")
+                if convert_image_with_vips(
+                    input_path,
+                    output_path,
+                    output_format,
+                    args.quality,
+                    args.width,
+                    args.height,
+                    args.max_size,
+                    args.optimize,
+                    args.webp_method,
+                    args.webp_lossless,
+                    args.tiff_compression,
+                ):
+                    print_file_size_info(input_path, output_path)
+                    return
+                if args.backend == "vips":
+                    print("pyvips is not installed, falling back to Pillow")
+
+            load_plugin(get_pillow_format(output_format))
             convert_image_to_image(
-                args.input_path,
-                args.output_path,
+                input_path,
+                output_path,
                 output_format,
                 args.quality,
                 args.width,
                 args.height,
                 args.max_size,
                 args.optimize,
+                args.webp_method,
+                args.webp_lossless,
+                args.tiff_compression,
+                args.resample,
+                args.progressive,
+                args.subsampling,
+                args.avif_speed,
+                args.threads,
+                args.palette,
+                source,
             )
-            get_file_size_info(args.input_path, args.output_path)
+            print_file_size_info(input_path, output_path)
 
     except Exception as e:
         print(f"Error during conversion: {e}")
         sys.exit(1)
 
 
+def _convert_one(job: tuple[argparse.Namespace, Path, Path]) -> bool:
+    """Batch worker: convert one file and report whether it succeeded."""
+    args, input_path, output_path = job
+    try:
+        convert_file(args, input_path, output_path)
+    except SystemExit:
+        return False
+    except Exception as e:
+        # One unreadable or undecodable file must not abort the whole batch
+        print(f"Error converting {input_path}: {e}")
+        return False
+    return True
+
+
+def run(args: argparse.Namespace) -> None:
+    """Validate parsed command line options and run the conversions."""
+    # Validate arguments
+    if args.quality < 1 or args.quality > 100:
+        print("Error: quality must be between 1 and 100")
+        sys.exit(1)
+
+    if args.palette is not None and not 2 <= args.palette <= 256:
+        print("Error: palette must be between 2 and 256 colors")
+        sys.exit(1)
+
+    # Only SVG output draws the background; parse the color once up front
+    # rather than failing per file later
+    svg_output = args.format == "svg" or args.output_path.suffix.lower() == ".svg"
+    if svg_output and args.background.lower() not in _SVG_PAINT_KEYWORDS:
+        try:
+            ImageColor.getrgb(args.background)
+        except ValueError:
+            print(f"Error: Invalid background color: {args.background}")
+            sys.exit(1)
+
+    if args.threads is not None and args.threads < 1:
+        print("Error: threads must be at least 1")
+        sys.exit(1)
+
+    if args.jobs < 1:
+        print("Error: jobs must be at least 1")
+        sys.exit(1)
+
+    if args.codec_info:
+        # Once per run, so a slow non-turbo Pillow build is easy to spot
+        print(f"JPEG codec: {jpeg_codec_info()}")
+
+    inputs = []
+    batch = bool(args.glob)
+    for input_path in args.input_path:
+        if input_path.is_dir():
+            # Convert every image directly inside the directory
+            batch = True
+            inputs.extend(
+                path
+                for path in sorted(input_path.iterdir())
+                if path.suffix.lower() in _INPUT_EXTENSIONS and path.is_file()
+            )
+        else:
+            inputs.append(input_path)
+    if args.glob:
+        inputs.extend(
+            Path(match)
+            for match in sorted(glob.glob(args.glob, recursive=True))
+            if os.path.isfile(match)
+        )
+
+    if not inputs:
+        print("Error: No input files to convert")
+        sys.exit(1)
+
+    if len(inputs) == 1 and not batch and not args.output_path.is_dir():
+        convert_file(args, inputs[0], args.output_path)
+        return
+
+    # Batch mode: output_path is the destination directory
+    output_dir = args.output_path
+    if output_dir.exists() and not output_dir.is_dir():
+        print(f"Error: Output path must be a directory for batch mode: {output_dir}")
+        sys.exit(1)
+
+    # Inputs sharing a stem would map to one output file and parallel
+    # workers would race to write it, so refuse rather than lose images
+    sources = {}
+    for input_path in inputs:
+        output_path = batch_output_path(input_path, output_dir, args.format)
+        other = sources.setdefault(output_path, input_path)
+        if other.resolve() != input_path.resolve():
+            print(
+                f"Error: {other} and {input_path} would both be written "
+                f"to {output_path}"
+            )
+            sys.exit(1)
+
+    # Each distinct input is converted once, even if listed twice
+    jobs = [
+        (args, input_path, output_path)
+        for output_path, input_path in sources.items()
+    ]
+
+    # Each conversion is independent and CPU-bound, so spread them across cores
+    workers = min(len(jobs), args.jobs)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for (_, input_path, _), ok in zip(jobs, executor.map(_convert_one, jobs)):
+            results.append(ok)
+            if not args.quiet:
+                status = "done" if ok else "failed"
+                print(f"[{len(results)}/{len(jobs)}] {input_path.name}: {status}")
+
+    failed = results.count(False)
+    print(f"Batch complete: {len(results) - failed}/{len(results)} files converted")
+    if failed:
+        sys.exit(1)
+
+
+def main() -> None:
+    run(parse_args())
+
+
 if __name__ == "__main__":
     main()
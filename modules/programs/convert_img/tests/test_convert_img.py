@@ -2,11 +2,18 @@
 Comprehensive tests for convert_img module.
 """
 
+import argparse
 import base64
+import struct
+import zlib
+import io
+import os
+import shutil
 import subprocess
 import sys
+import threading
 from pathlib import Path
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 from PIL import Image
@@ -16,6 +23,30 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import convert_img
 
 
+def embedded_payload(svg_path: Path, fmt: str) -> bytes:
+    """Decode the image embedded in an SVG file as a data URI of format fmt."""
+    # The SVG wrapper and base64 are ASCII, so skip decoding the file as text
+    content = svg_path.read_bytes()
+    marker = f"data:image/{fmt};base64,".encode()
+    return base64.b64decode(content.split(marker, 1)[1].split(b'"', 1)[0])
+
+
+def cli_args(*argv: str | Path) -> argparse.Namespace:
+    """Parse command line arguments for convert_img.run() without sys.argv."""
+    return convert_img._build_parser().parse_args([str(arg) for arg in argv])
+
+
+def fake_process(
+    stdin: io.BytesIO | None = None, returncode: int = 0, stderr: bytes = b""
+) -> Mock:
+    """Stand in for a finished Popen process writing stderr."""
+    return Mock(
+        stdin=io.BytesIO() if stdin is None else stdin,
+        returncode=returncode,
+        communicate=Mock(return_value=(None, stderr)),
+    )
+
+
 class TestArgumentParsing:
     """Test command line argument parsing."""
 
@@ -31,11 +62,13 @@ class TestArgumentParsing:
             ],
         ):
             args = convert_img.parse_args()
-            assert args.input_path == Path("input.jpg")
+            assert args.input_path == [Path("input.jpg")]
             assert args.output_path == Path("output.svg")
             assert args.method == "trace"
             assert args.format == "auto"
             assert args.quality == 90
+            assert args.webp_method == 0
+            assert args.webp_lossless is False
 
     def test_parse_args_with_options(self):
         """Test argument parsing with various options."""
@@ -88,7 +121,13 @@ class TestInputValidation:
     def test_validate_input_valid_image(self, sample_png):
         """Test validation with valid image file."""
         # Should not raise exception
-        convert_img.validate_input(sample_png)
+        convert_img.validate_input(sample_png).close()
+
+    def test_validate_input_returns_open_image(self, sample_png):
+        """Test validation hands back the opened image for reuse."""
+        with convert_img.validate_input(sample_png) as img:
+            assert img.format == "PNG"
+            assert img.size == (100, 100)
 
     def test_validate_input_invalid_image(self, temp_dir):
         """Test validation with invalid image file."""
@@ -98,214 +137,1052 @@ class TestInputValidation:
         with pytest.raises(SystemExit):
             convert_img.validate_input(invalid_file)
 
+    @pytest.mark.parametrize(
+        "fixture,expected",
+        [
+            ("sample_png", "PNG"),
+            ("sample_jpeg", "JPEG"),
+            ("sample_webp", "WEBP"),
+            ("sample_gif", "GIF"),
+            ("sample_bmp", "BMP"),
+            ("sample_tiff", "TIFF"),
+        ],
+    )
+    def test_sniff_format(self, request, fixture, expected):
+        """Test formats are recognised from their magic bytes."""
+        path = request.getfixturevalue(fixture)
+        assert convert_img.sniff_format(path) == expected
+
+    def test_sniff_format_unknown(self, temp_dir):
+        """Test unrecognised headers are left to Pillow."""
+        path = temp_dir / "image.tga"
+        Image.new("RGB", (10, 10)).save(path)
+        assert convert_img.sniff_format(path) is None
+        with convert_img.validate_input(path) as img:
+            assert img.format == "TGA"
+
+    def test_validate_input_opens_sniffed_format_only(self, sample_webp):
+        """Test a sniffed format restricts Pillow to that one plugin."""
+        with patch.object(
+            convert_img.Image, "open", wraps=Image.open
+        ) as mock_open:
+            convert_img.validate_input(sample_webp).close()
+        assert mock_open.call_args.kwargs["formats"] == ["WEBP"]
+
 
 class TestImageResizing:
     """Test image resizing functionality."""
 
-    def test_resize_image_no_resize(self, sample_png):
+    def test_resize_image_no_resize(self, sample_png_image):
         """Test image resizing with no parameters (should return unchanged)."""
-        with Image.open(sample_png) as img:
-            resized = convert_img.resize_image(img)
-            assert resized.size == img.size
+        img = sample_png_image
+        resized = convert_img.resize_image(img)
+        assert resized.size == img.size
 
-    def test_resize_image_by_width(self, sample_png):
+    def test_resize_image_by_width(self, sample_png_image):
         """Test image resizing by width only."""
-        with Image.open(sample_png) as img:
-            resized = convert_img.resize_image(img, width=50)
-            assert resized.width == 50
-            assert resized.height == 50  # Should maintain aspect ratio
+        img = sample_png_image
+        resized = convert_img.resize_image(img, width=50)
+        assert resized.width == 50
+        assert resized.height == 50  # Should maintain aspect ratio
 
-    def test_resize_image_by_height(self, sample_png):
+    def test_resize_image_by_height(self, sample_png_image):
         """Test image resizing by height only."""
-        with Image.open(sample_png) as img:
-            resized = convert_img.resize_image(img, height=50)
-            assert resized.height == 50
-            assert resized.width == 50  # Should maintain aspect ratio
+        img = sample_png_image
+        resized = convert_img.resize_image(img, height=50)
+        assert resized.height == 50
+        assert resized.width == 50  # Should maintain aspect ratio
 
-    def test_resize_image_by_max_size(self, sample_png):
+    def test_resize_image_by_max_size(self, sample_png_image):
         """Test image resizing by max size."""
-        with Image.open(sample_png) as img:
-            resized = convert_img.resize_image(img, max_size=50)
-            assert max(resized.size) == 50
+        img = sample_png_image
+        resized = convert_img.resize_image(img, max_size=50)
+        assert max(resized.size) == 50
 
-    def test_resize_image_both_dimensions(self, sample_png):
+    def test_resize_image_both_dimensions(self, sample_png_image):
         """Test image resizing with both width and height."""
+        img = sample_png_image
+        resized = convert_img.resize_image(img, width=80, height=60)
+        assert resized.size == (80, 60)
+
+    @pytest.mark.parametrize("resample", ["lanczos", "bicubic", "bilinear"])
+    def test_resize_image_resample_filters(self, sample_png_image, resample):
+        """Test image resizing with each supported resampling filter."""
+        img = sample_png_image
+        resized = convert_img.resize_image(img, width=40, resample=resample)
+        assert resized.size == (40, 40)
+
+    def test_draft_image_jpeg(self, sample_jpeg):
+        """Test JPEG drafting decodes at a reduced DCT scale."""
+        with Image.open(sample_jpeg) as img:
+            convert_img.draft_image(img, (25, 25))
+            assert img.size == (25, 25)
+
+    def test_draft_image_non_jpeg(self, sample_png):
+        """Test drafting leaves non-JPEG images untouched."""
         with Image.open(sample_png) as img:
-            resized = convert_img.resize_image(img, width=80, height=60)
-            assert resized.size == (80, 60)
+            convert_img.draft_image(img, (25, 25))
+            assert img.size == (100, 100)
+
+    def test_resize_image_large_downscale(self):
+        """Test large downscales use the reduce prefilter and stay accurate."""
+        img = Image.new("RGB", (200, 100), color="red")
+        with patch.object(Image.Image, "reduce", wraps=img.reduce) as mock_reduce:
+            resized = convert_img.resize_image(img, max_size=20)
+        mock_reduce.assert_called_once()
+        assert resized.size == (20, 10)
+        assert resized.getpixel((10, 5)) == (255, 0, 0)
+
+    @pytest.mark.parametrize(
+        "size,kwargs,expected",
+        [
+            ((10000, 1), {"max_size": 100}, (100, 1)),
+            ((1, 10000), {"max_size": 100}, (1, 100)),
+            ((10000, 1), {"width": 100}, (100, 1)),
+            ((1, 10000), {"height": 100}, (1, 100)),
+        ],
+    )
+    def test_get_resize_size_keeps_thin_dimension(self, size, kwargs, expected):
+        """Test extreme aspect ratios never scale a dimension to zero."""
+        # Pure size math, so no image needs to be allocated
+        assert convert_img.get_resize_size(size, **kwargs) == expected
 
 
 class TestBase64Encoding:
     """Test base64 image encoding."""
 
-    def test_image_to_base64_png(self, sample_png):
+    def test_image_to_base64_png(self, sample_png_image):
         """Test PNG to base64 conversion."""
-        with Image.open(sample_png) as img:
-            b64_str = convert_img.image_to_base64(img, "png")
-            assert isinstance(b64_str, str)
-            # Verify it's valid base64
-            decoded = base64.b64decode(b64_str)
-            assert len(decoded) > 0
+        img = sample_png_image
+        b64_str = convert_img.image_to_base64(img, "png")
+        assert isinstance(b64_str, str)
+        # Only the signature matters, so decode just the first 6 bytes
+        assert base64.b64decode(b64_str[:8]).startswith(b"\x89PNG")
 
-    def test_image_to_base64_jpeg(self, sample_png):
+    def test_image_to_base64_jpeg(self, sample_png_image):
         """Test JPEG to base64 conversion."""
-        with Image.open(sample_png) as img:
-            b64_str = convert_img.image_to_base64(img, "jpeg", quality=80)
-            assert isinstance(b64_str, str)
-            decoded = base64.b64decode(b64_str)
-            assert len(decoded) > 0
+        img = sample_png_image
+        b64_str = convert_img.image_to_base64(img, "jpeg", quality=80)
+        assert isinstance(b64_str, str)
+        assert base64.b64decode(b64_str[:8]).startswith(b"\xff\xd8\xff")
 
-    def test_image_to_base64_webp(self, sample_png):
+    def test_image_to_base64_webp(self, sample_png_image):
         """Test WebP to base64 conversion."""
-        with Image.open(sample_png) as img:
-            b64_str = convert_img.image_to_base64(img, "webp", quality=80)
-            assert isinstance(b64_str, str)
-            decoded = base64.b64decode(b64_str)
-            assert len(decoded) > 0
+        img = sample_png_image
+        b64_str = convert_img.image_to_base64(img, "webp", quality=80)
+        assert isinstance(b64_str, str)
+        header = base64.b64decode(b64_str[:16])
+        assert header[:4] == b"RIFF" and header[8:12] == b"WEBP"
+
+    def test_image_to_base64_large_image_round_trips(self):
+        """Test a large payload decodes bit-for-bit to the encoded image."""
+        img = Image.merge("RGB", [Image.effect_noise((512, 512), 64)] * 3)
+        prepared, save_kwargs = convert_img.prepare_embed_image(img, "png")
+        expected = io.BytesIO()
+        prepared.save(expected, **save_kwargs)
+
+        b64_str = convert_img.image_to_base64(img, "png")
+
+        assert base64.b64decode(b64_str) == expected.getvalue()
+
+    def test_image_to_base64_reused_buffer(self, sample_png_image, sample_rgba_png):
+        """Test a reused buffer yields the same output as a fresh one."""
+        buffer = io.BytesIO()
+        with Image.open(sample_rgba_png) as img:
+            convert_img.image_to_base64(img, "png", buffer=buffer)
+        img = sample_png_image
+        expected = convert_img.image_to_base64(img, "png")
+        assert convert_img.image_to_base64(img, "png", buffer=buffer) == expected
+
+    @pytest.mark.parametrize(
+        "fmt,expected",
+        [
+            ("jpeg", {"format": "JPEG", "quality": 80, "optimize": True}),
+            ("png", {"format": "PNG", "optimize": True}),
+            ("tiff", {"format": "TIFF", "compression": "zstd"}),
+            ("bmp", {"format": "BMP"}),
+        ],
+    )
+    def test_prepare_embed_image_save_kwargs(self, sample_rgba_png, fmt, expected):
+        """Test embed save arguments for each format."""
+        with Image.open(sample_rgba_png) as img:
+            prepared, save_kwargs = convert_img.prepare_embed_image(img, fmt, 80)
+            assert save_kwargs == expected
+            if fmt in ("jpeg", "bmp"):
+                assert prepared.mode == "RGB"
+
+    @pytest.mark.parametrize("fmt,mode", [("png", "P"), ("jpeg", "RGB")])
+    def test_prepare_embed_image_palette(self, sample_rgba_png, fmt, mode):
+        """Test --palette quantizes only formats that keep a palette."""
+        with Image.open(sample_rgba_png) as img:
+            prepared, _ = convert_img.prepare_embed_image(img, fmt, palette=16)
+            assert prepared.mode == mode
+            if mode == "P":
+                assert len(prepared.getcolors()) <= 16
+
+    def test_no_redundant_rgb_convert(self, sample_jpeg):
+        """Test an RGB JPEG is embedded as JPEG without a mode conversion."""
+        with Image.open(sample_jpeg) as img:
+            assert img.mode == "RGB"
+            with patch.object(Image.Image, "convert") as mock_convert:
+                convert_img.create_embedded_svg(img, "jpeg", 90, "transparent", False)
+        mock_convert.assert_not_called()
 
     def test_image_to_base64_rgba_to_jpeg(self, sample_rgba_png):
         """Test RGBA image conversion to JPEG (should convert to RGB)."""
         with Image.open(sample_rgba_png) as img:
             b64_str = convert_img.image_to_base64(img, "jpeg")
             assert isinstance(b64_str, str)
-            decoded = base64.b64decode(b64_str)
-            assert len(decoded) > 0
+            assert base64.b64decode(b64_str[:8]).startswith(b"\xff\xd8\xff")
 
 
 class TestSVGCreation:
     """Test SVG creation functionality."""
 
-    def test_create_embedded_svg_basic(self, sample_png):
+    def test_create_embedded_svg_basic(self, sample_png_image):
         """Test basic embedded SVG creation."""
-        with Image.open(sample_png) as img:
-            svg_content = convert_img.create_embedded_svg(
-                img,
-                "png",
-                90,
-                "transparent",
-                False,
-            )
-            assert svg_content.startswith('<?xml version="1.0"')
-            assert "<svg" in svg_content
-            assert "image" in svg_content
-            assert "data:image/png;base64," in svg_content
+        img = sample_png_image
+        svg_content = convert_img.create_embedded_svg(
+            img,
+            "png",
+            90,
+            "transparent",
+            False,
+        )
+        assert svg_content.startswith('<?xml version="1.0"')
+        assert "<svg" in svg_content
+        assert "image" in svg_content
+        assert "data:image/png;base64," in svg_content
 
-    def test_create_embedded_svg_with_background(self, sample_png):
+    def test_create_embedded_svg_with_background(self, sample_png_image):
         """Test embedded SVG creation with background."""
-        with Image.open(sample_png) as img:
-            svg_content = convert_img.create_embedded_svg(
-                img, "png", 90, "white", False
+        img = sample_png_image
+        svg_content = convert_img.create_embedded_svg(
+            img, "png", 90, "white", False
+        )
+        assert 'fill="white"' in svg_content
+
+    @pytest.mark.parametrize(
+        "fmt,mime",
+        [
+            ("png", "image/png"),
+            ("jpeg", "image/jpeg"),
+            ("webp", "image/webp"),
+            ("tiff", "image/tiff"),
+            ("bmp", "image/bmp"),
+            ("avif", "image/avif"),
+        ],
+    )
+    def test_embedded_svg_parts_different_formats(self, fmt, mime):
+        """Test the embedded SVG markup names each format's MIME type."""
+        # Only the markup depends on the format, so skip encoding the image
+        prefix, suffix = convert_img.embedded_svg_parts(100, 100, fmt, "transparent")
+        assert prefix.endswith(f"data:{mime};base64,")
+        assert suffix == '"/>\n</svg>'
+
+    @pytest.mark.parametrize("fmt", ["png", "jpeg", "tiff", "ico"])
+    def test_write_embedded_svg_matches_in_memory(self, sample_rgba_png, temp_dir, fmt):
+        """Test streamed SVG output matches the in-memory SVG."""
+        output_path = temp_dir / "streamed.svg"
+        with Image.open(sample_rgba_png) as img:
+            expected = convert_img.create_embedded_svg(
+                img, fmt, 90, "white", False
+            )
+            convert_img.write_embedded_svg(
+                img, fmt, 90, "white", False, output_path
             )
-            assert 'fill="white"' in svg_content
+        assert output_path.read_text(encoding="utf-8") == expected
 
-    def test_create_embedded_svg_different_formats(self, sample_png):
-        """Test embedded SVG creation with different formats."""
-        formats = [
-            "png",
-            "jpeg",
-            "webp",
-            "tiff",
-            "bmp",
-            "avif",
-        ]
-        with Image.open(sample_png) as img:
-            for fmt in formats:
-                svg_content = convert_img.create_embedded_svg(
-                    img,
-                    fmt,
-                    90,
-                    "transparent",
-                    False,
+    def test_write_embedded_svg_encode_error(self, sample_png_image, temp_dir):
+        """Test a failed encode leaves no partial SVG behind."""
+        output_path = temp_dir / "embedded.svg"
+        output_path.write_text("previous")
+
+        with patch.object(
+            convert_img,
+            "prepare_embed_image",
+            return_value=(sample_png_image, {"format": "NOT-A-FORMAT"}),
+        ):
+            with pytest.raises(KeyError):
+                convert_img.write_embedded_svg(
+                    sample_png_image, "png", 90, "white", False, output_path
                 )
-                assert f"data:image/{fmt};base64," in svg_content
+
+        assert output_path.read_text() == "previous"
+        assert list(temp_dir.iterdir()) == [output_path]
+
+    def test_write_passthrough_svg_copy_error(self, sample_png, temp_dir):
+        """Test a failed passthrough copy leaves no partial SVG behind."""
+        output_path = temp_dir / "embedded.svg"
+        output_path.write_text("previous")
+
+        with patch.object(convert_img, "copy_base64", side_effect=OSError("boom")):
+            with pytest.raises(OSError):
+                convert_img.write_passthrough_svg(
+                    sample_png, (100, 100), "png", "white", output_path
+                )
+
+        assert output_path.read_text() == "previous"
+        assert list(temp_dir.iterdir()) == [output_path]
+
+    def test_copy_base64_pipe_short_writes(self):
+        """Test streaming from a pipe fed in odd-sized pieces stays unpadded."""
+        data = bytes(range(256)) * 100
+        read_fd, write_fd = os.pipe()
+
+        def feed() -> None:
+            with os.fdopen(write_fd, "wb", buffering=0) as pipe:
+                for start in range(0, len(data), 1000):
+                    pipe.write(data[start:start + 1000])
+
+        feeder = threading.Thread(target=feed)
+        feeder.start()
+        dst = io.BytesIO()
+        with patch.object(convert_img, "EMBED_CHUNK_SIZE", 3 * 1024):
+            with os.fdopen(read_fd, "rb") as src:
+                convert_img.copy_base64(src, dst)
+        feeder.join()
+
+        assert dst.getvalue() == base64.b64encode(data)
+
+    def test_convert_image_to_embedded_svg(self, sample_jpeg, temp_dir):
+        """Test the embed pipeline resizes and writes a complete SVG."""
+        output_path = temp_dir / "embedded.svg"
+
+        convert_img.convert_image_to_embedded_svg(
+            sample_jpeg,
+            output_path,
+            "webp",
+            max_size=40,
+        )
+
+        content = output_path.read_text()
+        assert 'width="40"' in content
+        assert "data:image/webp;base64," in content
+        assert content.endswith('"/>\n</svg>')
+
+    def test_main_embed_ico(self, sample_png, temp_dir):
+        """Test embedding ICO, whose encoder seeks, still writes the icon."""
+        output_path = temp_dir / "embedded.svg"
+
+        convert_img.run(cli_args(sample_png, output_path, "-m", "embed", "-f", "ico"))
+
+        # ICO has no MIME entry, so it is labelled with the PNG fallback
+        payload = embedded_payload(output_path, "png")
+        with Image.open(io.BytesIO(payload)) as embedded:
+            assert embedded.format == "ICO"
+
+    def test_convert_image_to_embedded_svg_passthrough(self, sample_png, temp_dir):
+        """Test same-format embeds reuse the input bytes unchanged."""
+        output_path = temp_dir / "embedded.svg"
+
+        convert_img.convert_image_to_embedded_svg(
+            sample_png, output_path, "png", copy_input=True
+        )
+
+        assert embedded_payload(output_path, "png") == sample_png.read_bytes()
+
+    @pytest.mark.parametrize(
+        "extra_args,copied",
+        [([], True), (["-q", "50"], False), (["--force-reencode"], False)],
+    )
+    def test_main_embed_passthrough_respects_options(
+        self, sample_jpeg, temp_dir, extra_args, copied
+    ):
+        """Test encoder options stop an embed from reusing the input bytes."""
+        output_path = temp_dir / "embedded.svg"
+
+        convert_img.run(
+            cli_args(sample_jpeg, output_path, "-m", "embed", "-f", "jpeg", *extra_args)
+        )
+
+        payload = embedded_payload(output_path, "jpeg")
+        assert (payload == sample_jpeg.read_bytes()) is copied
+
+    def test_convert_image_to_embedded_svg_palette(self, sample_png, temp_dir):
+        """Test --palette re-encodes even when the input format matches."""
+        output_path = temp_dir / "embedded.svg"
+
+        convert_img.convert_image_to_embedded_svg(
+            sample_png, output_path, "png", palette=8
+        )
+
+        payload = embedded_payload(output_path, "png")
+        with Image.open(io.BytesIO(payload)) as embedded:
+            assert embedded.mode == "P"
 
 
 class TestTracedSVGCreation:
     """Test traced SVG creation (requires potrace)."""
 
-    @patch("subprocess.run")
-    def test_create_traced_svg_potrace_not_found(self, mock_run, temp_dir):
-        """Test traced SVG creation when potrace is not available."""
-        mock_run.side_effect = FileNotFoundError()
+    @pytest.fixture(autouse=True)
+    def no_potrace_binding(self):
+        """Exercise the potrace subprocess even where pypotrace is installed."""
+        with patch.object(convert_img, "_potrace_binding", return_value=None):
+            yield
 
+    @patch.object(convert_img, "_potrace_path", return_value=None)
+    @patch("subprocess.Popen")
+    def test_create_traced_svg_potrace_not_found(
+        self, mock_popen, mock_path, temp_dir
+    ):
+        """Test traced SVG creation when potrace is not available."""
         input_path = temp_dir / "input.png"
         output_path = temp_dir / "output.svg"
 
         result = convert_img.create_traced_svg(input_path, output_path, "")
         assert result is False
+        mock_popen.assert_not_called()
+
+    @patch.object(convert_img, "_potrace_path", return_value="/usr/bin/potrace")
+    @patch("subprocess.Popen")
+    def test_create_traced_svg_success(
+        self, mock_popen, mock_path, sample_png, temp_dir
+    ):
+        """Test successful traced SVG creation."""
+        # Mock the potrace process
+        mock_popen.return_value = fake_process()
+
+        output_path = temp_dir / "output.svg"
+
+        # Create a dummy SVG file to simulate potrace output
+        output_path.write_text("<svg></svg>")
+
+        result = convert_img.create_traced_svg(sample_png, output_path, "")
+        assert result is True
+
+    @patch("subprocess.Popen")
+    def test_create_traced_svg_binding(self, mock_popen, sample_png, temp_dir):
+        """Test pypotrace traces in-process without running potrace."""
+        segments = [
+            Mock(is_corner=True, c=(4, 0), end_point=(4, 4)),
+            Mock(is_corner=False, c1=(2, 5), c2=(1, 5), end_point=(0, 0)),
+        ]
+        curve = MagicMock(start_point=(0, 0))
+        curve.__iter__.return_value = iter(segments)
+        mock_potrace = Mock()
+        mock_potrace.Bitmap.return_value.trace.return_value = [curve]
+        output_path = temp_dir / "output.svg"
+
+        with (
+            patch.object(convert_img, "_potrace_binding", return_value=mock_potrace),
+            patch.dict(sys.modules, {"numpy": Mock()}),
+        ):
+            assert convert_img.create_traced_svg(sample_png, output_path, "")
+
+        mock_popen.assert_not_called()
+        svg = output_path.read_text()
+        assert 'viewBox="0 0 100 100"' in svg
+        assert 'd="M0,0L4,0L4,4C2,5 1,5 0,0z"' in svg
+
+    @patch.object(convert_img, "_potrace_path", return_value="/usr/bin/potrace")
+    @patch("subprocess.Popen")
+    def test_create_traced_svg_binding_error_falls_back(
+        self, mock_popen, mock_path, sample_png, temp_dir, capsys
+    ):
+        """Test a failing pypotrace trace falls back to the potrace executable."""
+        mock_popen.return_value = fake_process()
+        mock_potrace = Mock()
+        mock_potrace.Bitmap.return_value.trace.side_effect = RuntimeError("boom")
+
+        with (
+            patch.object(convert_img, "_potrace_binding", return_value=mock_potrace),
+            patch.dict(sys.modules, {"numpy": Mock()}),
+        ):
+            assert convert_img.create_traced_svg(
+                sample_png, temp_dir / "output.svg", ""
+            )
+
+        assert "pypotrace tracing failed: boom" in capsys.readouterr().out
+        assert mock_popen.call_args.args[0][0] == "/usr/bin/potrace"
+
+    @patch.object(convert_img, "_potrace_path", return_value="/usr/bin/potrace")
+    @patch("subprocess.Popen")
+    def test_create_traced_svg_pipes_bitmap(
+        self, mock_popen, mock_path, sample_png, temp_dir
+    ):
+        """Test the PBM bitmap is streamed to potrace on stdin."""
+        stdin = io.BytesIO()
+        mock_popen.return_value = fake_process(stdin)
+        output_path = temp_dir / "output.svg"
+
+        assert convert_img.create_traced_svg(sample_png, output_path, "-t 4")
+
+        cmd = mock_popen.call_args.args[0]
+        assert cmd[0] == "/usr/bin/potrace"
+        assert cmd[-2:] == ["-o", str(output_path)]
+        assert "-t" in cmd
+        assert stdin.getvalue().startswith(b"P4")
+
+    @patch.object(convert_img, "_potrace_path", return_value="/usr/bin/potrace")
+    @patch("subprocess.Popen")
+    def test_create_traced_svg_potrace_error(
+        self, mock_popen, mock_path, sample_png, temp_dir
+    ):
+        """Test a failing potrace run reports failure."""
+        mock_popen.return_value = fake_process(
+            returncode=1, stderr=b"potrace: bad option"
+        )
+
+        result = convert_img.create_traced_svg(
+            sample_png, temp_dir / "output.svg", "--bogus"
+        )
+        assert result is False
+
+    @patch.object(convert_img, "_mkbitmap_path", return_value="/usr/bin/mkbitmap")
+    @patch.object(convert_img, "_potrace_path", return_value="/usr/bin/potrace")
+    @patch("subprocess.Popen")
+    def test_create_traced_svg_mkbitmap_pipeline(
+        self, mock_popen, mock_path, mock_mkbitmap, sample_png, temp_dir
+    ):
+        """Test --mkbitmap pipes a grayscale PGM through mkbitmap to potrace."""
+        filter_stdin = io.BytesIO()
+        filter_stdin.close = Mock()
+        mock_filter = Mock(stdin=filter_stdin)
+        mock_potrace = fake_process()
+        mock_popen.side_effect = [mock_filter, mock_potrace]
+
+        assert convert_img.create_traced_svg(
+            sample_png, temp_dir / "output.svg", "", preprocess=True
+        )
+
+        filter_call, potrace_call = mock_popen.call_args_list
+        assert filter_call.args[0][:3] == ["/usr/bin/mkbitmap", "-s", "1"]
+        assert potrace_call.kwargs["stdin"] is mock_filter.stdout
+        assert filter_stdin.getvalue().startswith(b"P5")
+        mock_filter.wait.assert_called_once()
+
+    @patch.object(convert_img, "_mkbitmap_path", return_value=None)
+    @patch.object(convert_img, "_potrace_path", return_value="/usr/bin/potrace")
+    @patch("subprocess.Popen")
+    def test_create_traced_svg_builtin_highpass(
+        self, mock_popen, mock_path, mock_mkbitmap, sample_png, temp_dir
+    ):
+        """Test --mkbitmap falls back to the built-in filter."""
+        stdin = io.BytesIO()
+        mock_popen.return_value = fake_process(stdin)
+
+        assert convert_img.create_traced_svg(
+            sample_png, temp_dir / "output.svg", "", preprocess=True
+        )
+
+        mock_popen.assert_called_once()
+        assert stdin.getvalue().startswith(b"P4")
+
+    def test_create_traced_svg_mkbitmap_keeps_size(self, sample_png, temp_dir):
+        """Test mkbitmap and the built-in filter trace at the same size."""
+        # Stand-ins that scale like mkbitmap and size the SVG like potrace
+        scripts = {
+            "mkbitmap": (
+                "args = sys.argv[1:]\n"
+                "scale = int(args[args.index('-s') + 1]) if '-s' in args else 2\n"
+                "img = Image.open(io.BytesIO(sys.stdin.buffer.read()))\n"
+                "img = img.resize((img.width * scale, img.height * scale))\n"
+                "img.convert('1').save(sys.stdout.buffer, 'PPM')\n"
+            ),
+            "potrace": (
+                "img = Image.open(io.BytesIO(sys.stdin.buffer.read()))\n"
+                "out = sys.argv[sys.argv.index('-o') + 1]\n"
+                "open(out, 'w').write(f'<svg width=\"{img.width}\" "
+                "height=\"{img.height}\"/>')\n"
+            ),
+        }
+        bin_dir = temp_dir / "bin"
+        bin_dir.mkdir()
+        for name, body in scripts.items():
+            script = bin_dir / name
+            script.write_text(
+                f"#!{sys.executable}\nimport io, sys\nfrom PIL import Image\n{body}"
+            )
+            script.chmod(0o755)
+
+        svgs = []
+        for mkbitmap in (None, str(bin_dir / "mkbitmap")):
+            output_path = temp_dir / f"traced_{len(svgs)}.svg"
+            with (
+                patch.object(convert_img, "_mkbitmap_path", return_value=mkbitmap),
+                patch.object(
+                    convert_img, "_potrace_path", return_value=str(bin_dir / "potrace")
+                ),
+            ):
+                assert convert_img.create_traced_svg(
+                    sample_png, output_path, "", preprocess=True
+                )
+            svgs.append(output_path.read_text())
+
+        assert svgs[0] == svgs[1] == '<svg width="100" height="100"/>'
+
+    def test_highpass_bitmap_removes_smooth_background(self):
+        """Test the highpass filter keeps edges but drops gradual shading."""
+        img = Image.linear_gradient("L").resize((64, 64))
+        img.paste(0, (28, 28, 36, 36))
+        bw = convert_img.highpass_bitmap(img)
+        assert bw.mode == "1"
+        assert bw.getpixel((32, 32)) == 0
+        assert bw.getpixel((5, 60)) == 255
+
+    def test_create_vtraced_svg_not_installed(self, sample_png, temp_dir):
+        """Test vtracer tracing reports failure when vtracer is missing."""
+        with patch.dict(sys.modules, {"vtracer": None}):
+            result = convert_img.create_vtraced_svg(
+                sample_png, temp_dir / "output.svg"
+            )
+        assert result is False
+
+    def test_create_vtraced_svg_success(self, sample_png, temp_dir):
+        """Test vtracer tracing is called with color mode."""
+        mock_vtracer = Mock()
+        output_path = temp_dir / "output.svg"
+
+        with patch.dict(sys.modules, {"vtracer": mock_vtracer}):
+            result = convert_img.create_vtraced_svg(sample_png, output_path)
+
+        assert result is True
+        mock_vtracer.convert_image_to_svg_py.assert_called_once_with(
+            str(sample_png), str(output_path), colormode="color"
+        )
+
+    @patch.object(convert_img, "create_traced_svg", return_value=True)
+    @patch.object(convert_img, "create_vtraced_svg", return_value=False)
+    def test_main_vtracer_falls_back_to_potrace(
+        self, mock_vtraced, mock_traced, sample_png, temp_dir
+    ):
+        """Test the vtracer backend falls back to potrace on failure."""
+        test_args = [
+            "convert_img",
+            str(sample_png),
+            str(temp_dir / "output.svg"),
+            "--trace-backend",
+            "vtracer",
+        ]
+
+        with patch.object(sys, "argv", test_args):
+            convert_img.main()
+
+        mock_vtraced.assert_called_once()
+        mock_traced.assert_called_once()
+
+    def test_binarize_image_threshold(self):
+        """Test binarization thresholds grayscale values at 128."""
+        img = Image.linear_gradient("L")
+        bw = convert_img.binarize_image(img)
+        assert bw.mode == "1"
+        assert bw.getpixel((0, 127)) == 0
+        assert bw.getpixel((0, 128)) == 255
+
+    def test_grayscale_image_skips_copy(self):
+        """Test grayscale input is used as-is rather than copied."""
+        img = Image.linear_gradient("L")
+        assert convert_img.grayscale_image(img) is img
+        assert convert_img.grayscale_image(img.convert("RGB")).mode == "L"
+
+
+class TestMainFunction:
+    """Test the main function integration."""
+
+    def test_main_embed_method(self, sample_png, temp_dir, monkeypatch):
+        """Test main function with embed method."""
+        output_path = temp_dir / "output.svg"
+
+        convert_img.run(
+            cli_args(sample_png, output_path, "--method", "embed", "--format", "png")
+        )
+
+        assert output_path.exists()
+        # Check if it's actually an SVG file by checking the extension and content
+        if output_path.suffix.lower() == ".svg":
+            content = output_path.read_text()
+            assert "<svg" in content
+            assert "image" in content
+        else:
+            # If not SVG, verify it's a valid image file
+            with Image.open(output_path) as result_img:
+                assert result_img.size == (
+                    100,
+                    100,
+                )
+
+    @pytest.mark.parametrize("suffix", [".svg", ".jpeg"])
+    def test_main_opens_input_once(self, sample_png, temp_dir, suffix):
+        """Test the input image is opened once for validation and conversion."""
+        output_path = temp_dir / f"output{suffix}"
+
+        test_args = [
+            "convert_img",
+            str(sample_png),
+            str(output_path),
+            "--method",
+            "embed",
+        ]
+
+        with patch.object(sys, "argv", test_args):
+            with patch.object(
+                convert_img.Image, "open", wraps=Image.open
+            ) as mock_open:
+                convert_img.main()
+
+        assert mock_open.call_count == 1
+        assert output_path.exists()
+
+    def test_main_embed_default_lossless_webp(self, sample_png, temp_dir):
+        """Test embed method defaults to lossless WebP."""
+        output_path = temp_dir / "output.svg"
+
+        test_args = [
+            "convert_img",
+            str(sample_png),
+            str(output_path),
+            "--method",
+            "embed",
+        ]
+
+        with patch.object(sys, "argv", test_args):
+            convert_img.main()
+
+        # Lossless WebP bitstreams use the VP8L chunk
+        assert embedded_payload(output_path, "webp")[12:16] == b"VP8L"
+
+    def test_main_embed_jpeg_max_size(self, sample_jpeg, temp_dir):
+        """Test embed method downscales JPEG input to the requested size."""
+        output_path = temp_dir / "output.svg"
+
+        test_args = [
+            "convert_img",
+            str(sample_jpeg),
+            str(output_path),
+            "--method",
+            "embed",
+            "--max-size",
+            "30",
+        ]
+
+        with patch.object(sys, "argv", test_args):
+            convert_img.main()
+
+        content = output_path.read_text()
+        assert 'width="30"' in content
+        assert 'height="30"' in content
+
+    @pytest.mark.parametrize("backend", ["potrace", "vtracer"])
+    def test_main_trace_falls_back_to_embed(
+        self, sample_png, temp_dir, capsys, backend
+    ):
+        """Test a failed trace falls back to the embed method."""
+        output_path = temp_dir / "output.svg"
+        test_args = [
+            "convert_img",
+            str(sample_png),
+            str(output_path),
+            "--trace-backend",
+            backend,
+        ]
+
+        # Only the control flow is under test, so skip tracing and encoding
+        with patch.object(sys, "argv", test_args), patch.object(
+            convert_img, "create_vtraced_svg", return_value=False
+        ), patch.object(
+            convert_img, "create_traced_svg", return_value=False
+        ), patch.object(
+            convert_img, "convert_image_to_embedded_svg"
+        ) as mock_embed:
+            convert_img.main()
+
+        assert "Falling back to embed method..." in capsys.readouterr().out
+        mock_embed.assert_called_once()
+
+    def test_main_skips_full_plugin_scan(self, sample_png, temp_dir):
+        """Test a single conversion doesn't make Pillow import every plugin."""
+        script = (
+            "import sys\n"
+            "import convert_img\n"
+            "from PIL import Image\n"
+            "sys.argv = ['convert_img', sys.argv[1], sys.argv[2]]\n"
+            "convert_img.main()\n"
+            "assert Image._initialized < 2\n"
+        )
+
+        result = subprocess.run(
+            [sys.executable, "-c", script, sample_png, temp_dir / "output.webp"],
+            cwd=Path(convert_img.__file__).parent,
+            capture_output=True,
+        )
+
+        assert result.returncode == 0, result.stderr.decode()
+        with Image.open(temp_dir / "output.webp") as result_img:
+            assert result_img.format == "WEBP"
+
+    @pytest.mark.parametrize(
+        "option,value",
+        [
+            ("--quality", "150"),  # Invalid quality > 100
+            ("--palette", "1"),
+            ("--background", "#GGGGGG"),
+            ("--threads", "0"),
+            ("--jobs", "0"),
+        ],
+    )
+    def test_main_invalid_option(self, sample_png, temp_dir, option, value):
+        """Test main function rejects invalid option values before converting."""
+        output_path = temp_dir / "output.svg"
+
+        with pytest.raises(SystemExit):
+            convert_img.run(cli_args(sample_png, output_path, option, value))
+
+        assert not output_path.exists()
+
+    @pytest.mark.parametrize(
+        "output_name,background",
+        [
+            ("output.svg", "none"),
+            ("output.svg", "currentColor"),
+            ("output.jpeg", "none"),
+            # Raster outputs never draw the background, so it isn't parsed
+            ("output.jpeg", "#GGGGGG"),
+        ],
+    )
+    def test_main_background_accepted(
+        self, sample_png, temp_dir, output_name, background
+    ):
+        """Test SVG paint keywords and raster outputs pass background checks."""
+        output_path = temp_dir / output_name
+
+        convert_img.run(
+            cli_args(sample_png, output_path, "--background", background)
+        )
+
+        assert output_path.exists()
+
+    def test_main_quiet(self, sample_png, temp_dir, capsys):
+        """Test --quiet hides the report of a successful conversion."""
+        test_args = [
+            "convert_img",
+            str(sample_png),
+            str(temp_dir / "output.jpg"),
+            "--quiet",
+        ]
+
+        with patch.object(sys, "argv", test_args):
+            convert_img.main()
+
+        assert capsys.readouterr().out == ""
+        assert (temp_dir / "output.jpg").exists()
+
+    def test_main_same_format_copies(self, sample_png, temp_dir, capsys):
+        """Test a same-format conversion with no changes copies the file."""
+        output_path = temp_dir / "copy.png"
+        test_args = ["convert_img", str(sample_png), str(output_path)]
+
+        with patch.object(sys, "argv", test_args):
+            with patch.object(convert_img, "convert_image_to_image") as mock_convert:
+                convert_img.main()
+
+        mock_convert.assert_not_called()
+        assert "Copied" in capsys.readouterr().out
+        assert output_path.read_bytes() == sample_png.read_bytes()
+
+    @pytest.mark.parametrize(
+        "extra_args", [["--force-reencode"], ["--optimize"], ["--width", "50"]]
+    )
+    def test_main_same_format_reencodes(self, sample_png, temp_dir, extra_args):
+        """Test options that change the output force a re-encode."""
+        test_args = [
+            "convert_img",
+            str(sample_png),
+            str(temp_dir / "output.png"),
+            *extra_args,
+        ]
+
+        with patch.object(sys, "argv", test_args):
+            with patch.object(convert_img, "convert_image_to_image") as mock_convert:
+                convert_img.main()
+
+        mock_convert.assert_called_once()
+
+    def test_reencode_options_are_parser_options(self):
+        """Test option checks read their defaults from real parser options."""
+        # get_default() returns None for unknown names, hiding typos
+        dests = {action.dest for action in convert_img._build_parser()._actions}
+        assert set(convert_img._REENCODE_OPTIONS) <= dests
+        assert set(convert_img._PILLOW_ONLY_OPTIONS) <= dests
+
+    def test_main_quiet_still_reports_errors(self, temp_dir, capsys):
+        """Test --quiet still shows why a conversion failed."""
+        test_args = [
+            "convert_img",
+            str(temp_dir / "missing.png"),
+            str(temp_dir / "output.jpg"),
+            "--quiet",
+        ]
+
+        with patch.object(sys, "argv", test_args):
+            with pytest.raises(SystemExit):
+                convert_img.main()
+
+        assert "Input file does not exist" in capsys.readouterr().out
+
+    def test_main_same_input_output(self, sample_png, capsys):
+        """Test main function with same input and output paths."""
+        with pytest.raises(SystemExit):
+            convert_img.run(cli_args(sample_png, sample_png))
+
+        assert "Input and output paths cannot be the same" in capsys.readouterr().out
+
+    def test_main_batch_conversion(self, sample_png, sample_rgba_png, temp_dir):
+        """Test main function converting multiple inputs into a directory."""
+        output_dir = temp_dir / "out"
+
+        test_args = [
+            "convert_img",
+            str(sample_png),
+            str(sample_rgba_png),
+            str(output_dir),
+            "--format",
+            "webp",
+        ]
 
-    @patch("subprocess.run")
-    def test_create_traced_svg_success(self, mock_run, sample_png, temp_dir):
-        """Test successful traced SVG creation."""
-        # Mock potrace version check
-        mock_run.return_value = Mock(returncode=0, stderr="")
+        with patch.object(sys, "argv", test_args):
+            convert_img.main()
 
-        output_path = temp_dir / "output.svg"
+        for name in ("test.webp", "test_rgba.webp"):
+            with Image.open(output_dir / name) as result_img:
+                assert result_img.format == "WEBP"
 
-        # Create a dummy SVG file to simulate potrace output
-        output_path.write_text("<svg></svg>")
+    def test_main_batch_glob(self, sample_png, sample_rgba_png, temp_dir):
+        """Test batch mode collects inputs from a glob pattern."""
+        for sample in (sample_png, sample_rgba_png):
+            shutil.copy(sample, temp_dir)
+        output_dir = temp_dir / "out"
 
-        result = convert_img.create_traced_svg(sample_png, output_path, "")
-        assert result is True
+        test_args = [
+            "convert_img",
+            "--glob",
+            str(temp_dir / "*.png"),
+            str(output_dir),
+            "--format",
+            "jpeg",
+        ]
 
+        with patch.object(sys, "argv", test_args):
+            convert_img.main()
 
-class TestMainFunction:
-    """Test the main function integration."""
+        assert sorted(p.name for p in output_dir.iterdir()) == [
+            "test.jpeg",
+            "test_rgba.jpeg",
+        ]
 
-    def test_main_embed_method(self, sample_png, temp_dir, monkeypatch):
-        """Test main function with embed method."""
-        output_path = temp_dir / "output.svg"
+    def test_main_batch_directory(self, sample_png, sample_rgba_png, temp_dir):
+        """Test a directory input converts every image inside it."""
+        input_dir = temp_dir / "in"
+        input_dir.mkdir()
+        for sample in (sample_png, sample_rgba_png):
+            shutil.copy(sample, input_dir)
+        (input_dir / "notes.txt").write_text("not an image")
+        output_dir = temp_dir / "out"
 
-        # Mock sys.argv
         test_args = [
             "convert_img",
-            str(sample_png),
-            str(output_path),
-            "--method",
-            "embed",
+            str(input_dir),
+            str(output_dir),
             "--format",
-            "png",
+            "webp",
+            "--jobs",
+            "1",
         ]
 
         with patch.object(sys, "argv", test_args):
             convert_img.main()
 
-        assert output_path.exists()
-        # Check if it's actually an SVG file by checking the extension and content
-        if output_path.suffix.lower() == ".svg":
-            content = output_path.read_text()
-            assert "<svg" in content
-            assert "image" in content
-        else:
-            # If not SVG, verify it's a valid image file
-            with Image.open(output_path) as result_img:
-                assert result_img.size == (
-                    100,
-                    100,
+        assert sorted(p.name for p in output_dir.iterdir()) == [
+            "test.webp",
+            "test_rgba.webp",
+        ]
+
+    @pytest.mark.parametrize(
+        "names", [("a/icon.png", "b/icon.png"), ("icon.png", "icon.jpg")]
+    )
+    def test_main_batch_duplicate_outputs(self, sample_png, temp_dir, names, capsys):
+        """Test batch mode refuses inputs that would share an output file."""
+        for name in names:
+            path = temp_dir / "in" / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(sample_png, path)
+        output_dir = temp_dir / "out"
+
+        with pytest.raises(SystemExit):
+            convert_img.run(
+                cli_args(
+                    "--glob", temp_dir / "in" / "**" / "icon.*", output_dir, "-f", "webp"
                 )
+            )
 
-    def test_main_invalid_quality(self, sample_png, temp_dir):
-        """Test main function with invalid quality parameter."""
-        output_path = temp_dir / "output.svg"
+        assert "would both be written to" in capsys.readouterr().out
+        assert not output_dir.exists()
+
+    def test_main_batch_repeated_input(self, sample_png, temp_dir, capsys):
+        """Test an input listed twice in a batch is converted once."""
+        output_dir = temp_dir / "out"
+
+        convert_img.run(cli_args(sample_png, sample_png, output_dir, "-f", "webp"))
+
+        assert [p.name for p in output_dir.iterdir()] == ["test.webp"]
+        assert "Batch complete: 1/1 files converted" in capsys.readouterr().out
+
+    def test_main_batch_continues_after_error(self, sample_png, temp_dir, capsys):
+        """Test a file that fails to open doesn't stop the rest of a batch."""
+        input_dir = temp_dir / "in"
+        input_dir.mkdir()
+        shutil.copy(sample_png, input_dir)
+
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return (
+                struct.pack(">I", len(data))
+                + kind
+                + data
+                + struct.pack(">I", zlib.crc32(kind + data))
+            )
+
+        # A valid header claiming 10 gigapixels makes Image.open raise
+        # DecompressionBombError rather than UnidentifiedImageError
+        ihdr = struct.pack(">IIBBBBB", 100_000, 100_000, 8, 2, 0, 0, 0)
+        (input_dir / "bomb.png").write_bytes(
+            b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", ihdr)
+            + chunk(b"IDAT", b"")
+            + chunk(b"IEND", b"")
+        )
+        output_dir = temp_dir / "out"
+
+        with pytest.raises(SystemExit):
+            convert_img.run(cli_args(input_dir, output_dir, "-f", "webp"))
+
+        out = capsys.readouterr().out
+        assert "bomb.png: failed" in out
+        assert "Batch complete: 1/2 files converted" in out
+        assert [p.name for p in output_dir.iterdir()] == ["test.webp"]
 
+    def test_main_glob_no_matches(self, temp_dir):
+        """Test batch mode exits when the glob matches nothing."""
         test_args = [
             "convert_img",
-            str(sample_png),
-            str(output_path),
-            "--quality",
-            "150",  # Invalid quality > 100
+            "--glob",
+            str(temp_dir / "*.png"),
+            str(temp_dir / "out"),
         ]
 
         with patch.object(sys, "argv", test_args):
             with pytest.raises(SystemExit):
                 convert_img.main()
 
-    def test_main_same_input_output(self, sample_png):
-        """Test main function with same input and output paths."""
+    def test_main_batch_output_not_directory(self, sample_png, sample_jpeg, temp_dir):
+        """Test batch mode rejects an existing file as the output path."""
+        output_path = temp_dir / "existing.txt"
+        output_path.write_text("not a directory")
+
         test_args = [
             "convert_img",
             str(sample_png),
-            str(sample_png),  # Same path
+            str(sample_jpeg),
+            str(output_path),
         ]
 
         with patch.object(sys, "argv", test_args):
@@ -316,17 +1193,36 @@ class TestMainFunction:
 class TestFileSizeInfo:
     """Test file size information functionality."""
 
-    def test_get_file_size_info(self, sample_png, temp_dir, capsys):
+    def test_get_file_size_info(self):
+        """Test file size information is measured from both files."""
+        # Only stat() is used, so no real files are needed
+        input_path = Mock(**{"stat.return_value.st_size": 1000})
+        output_path = Mock(**{"stat.return_value.st_size": 250})
+
+        info = convert_img.get_file_size_info(input_path, output_path)
+
+        assert info == {"input_size": 1000, "output_size": 250, "ratio": 0.25}
+
+    @pytest.mark.parametrize(
+        "out_size,expected",
+        [(2000, "2.00x (100.0% larger)"), (250, "0.25x (75.0% smaller)")],
+    )
+    def test_format_file_size_info(self, out_size, expected):
         """Test file size information display."""
-        output_path = temp_dir / "output.txt"
-        output_path.write_text("test content")
+        text = convert_img._format_file_size_info(
+            {"input_size": 1000, "output_size": out_size, "ratio": out_size / 1000}
+        )
 
-        convert_img.get_file_size_info(sample_png, output_path)
+        assert "Input size:  1,000 bytes" in text
+        assert f"Output size: {out_size:,} bytes" in text
+        assert f"Size ratio:  {expected}" in text
 
-        captured = capsys.readouterr()
-        assert "Input size:" in captured.out
-        assert "Output size:" in captured.out
-        assert "Size ratio:" in captured.out
+    def test_get_file_size_info_missing_output(self, sample_png, temp_dir, capsys):
+        """Test no report is printed when the output file is missing."""
+        assert convert_img.get_file_size_info(sample_png, temp_dir / "missing.png") is None
+
+        convert_img.print_file_size_info(sample_png, temp_dir / "missing.png")
+        assert capsys.readouterr().out == ""
 
 
 class TestFormatSupport:
@@ -347,47 +1243,293 @@ class TestFormatSupport:
         """Test that various formats are accepted."""
         sample_file = request.getfixturevalue(sample_fixture)
         # Should not raise exception
-        convert_img.validate_input(sample_file)
+        convert_img.validate_input(sample_file).close()
 
-    def test_embed_conversion_all_formats(self, temp_dir):
+    # One case per mode, so xdist can spread them across workers
+    @pytest.mark.parametrize("mode", ["RGB", "RGBA", "L", "P"])
+    def test_embed_conversion_all_formats(self, temp_dir, mode):
         """Test embedded conversion for different input formats."""
-        formats = ["RGB", "RGBA", "L", "P"]
-
-        for mode in formats:
-            img_path = temp_dir / f"test_{mode.lower()}.png"
-            output_path = temp_dir / f"output_{mode.lower()}.svg"
+        img_path = temp_dir / f"test_{mode.lower()}.png"
+        output_path = temp_dir / f"output_{mode.lower()}.svg"
 
-            if mode == "P":
-                # Create palette mode image
-                img = Image.new("RGB", (50, 50), color="red")
-                img = img.convert("P")
-            else:
-                img = Image.new(
-                    mode,
-                    (50, 50),
-                    color=("red" if mode != "L" else 128),
-                )
+        if mode == "P":
+            # Create palette mode image
+            img = Image.new("RGB", (50, 50), color="red")
+            img = img.convert("P")
+        else:
+            img = Image.new(
+                mode,
+                (50, 50),
+                color=("red" if mode != "L" else 128),
+            )
 
-            img.save(img_path, "PNG")
+        img.save(img_path, "PNG")
 
-            test_args = [
-                "convert_img",
-                str(img_path),
-                str(output_path),
-                "--method",
-                "embed",
-            ]
+        test_args = [
+            "convert_img",
+            str(img_path),
+            str(output_path),
+            "--method",
+            "embed",
+        ]
 
-            with patch.object(sys, "argv", test_args):
-                convert_img.main()
+        with patch.object(sys, "argv", test_args):
+            convert_img.main()
 
-            assert output_path.exists()
-            assert "<svg" in output_path.read_text()
+        assert output_path.exists()
+        assert "<svg" in output_path.read_text()
 
 
 class TestImageToImageConversion:
     """Test image-to-image format conversion functionality."""
 
+    @pytest.mark.parametrize(
+        "output_format,expected",
+        [
+            (
+                "jpeg",
+                {
+                    "format": "JPEG",
+                    "quality": 80,
+                    "optimize": True,
+                    "progressive": False,
+                    "subsampling": -1,
+                },
+            ),
+            ("gif", {"format": "GIF", "optimize": True}),
+            (
+                "avif",
+                {"format": "AVIF", "quality": 80, "optimize": True, "speed": 6},
+            ),
+            ("tiff", {"format": "TIFF", "compression": "tiff_lzw"}),
+            ("bmp", {"format": "BMP"}),
+        ],
+    )
+    def test_get_save_kwargs(self, output_format, expected):
+        """Test save arguments for each output format."""
+        save_kwargs = convert_img.get_save_kwargs(
+            output_format, 80, True, tiff_compression="lzw"
+        )
+        assert save_kwargs == expected
+
+    def test_conversion_jpeg_progressive_subsampling(self, sample_png, temp_dir):
+        """Test progressive and subsampling options reach the JPEG encoder."""
+        output_path = temp_dir / "output.jpg"
+
+        convert_img.convert_image_to_image(
+            sample_png,
+            output_path,
+            "jpeg",
+            progressive=True,
+            subsampling=0,
+        )
+
+        with Image.open(output_path) as result_img:
+            assert result_img.info.get("progressive")
+            assert result_img.layer[0][1:3] == (1, 1)  # 4:4:4 sampling
+
+    @pytest.mark.parametrize(
+        "output_format,max_size",
+        [("gif", None), ("gif", 50), ("webp", 50), ("png", 50), ("tiff", 50)],
+    )
+    def test_conversion_animated(self, temp_dir, output_format, max_size):
+        """Test animations keep every frame, duration and the resize."""
+        input_path = temp_dir / "animated.gif"
+        frames = [
+            Image.new("RGB", (100, 100), color) for color in ("red", "lime", "blue")
+        ]
+        frames[0].save(
+            input_path,
+            save_all=True,
+            append_images=frames[1:],
+            duration=[100, 200, 300],
+            loop=0,
+        )
+        output_path = temp_dir / f"output.{output_format}"
+
+        convert_img.convert_image_to_image(
+            input_path, output_path, output_format, max_size=max_size
+        )
+
+        with Image.open(output_path) as result_img:
+            assert result_img.n_frames == 3
+            assert result_img.size == ((max_size or 100),) * 2
+            if output_format in ("gif", "png"):
+                result_img.seek(2)
+                assert result_img.info["duration"] == 300
+
+    def test_get_save_kwargs_avif_knobs(self):
+        """Test AVIF speed, subsampling and thread options."""
+        save_kwargs = convert_img.get_save_kwargs(
+            "avif", subsampling=0, avif_speed=9, threads=2
+        )
+        assert save_kwargs["speed"] == 9
+        assert save_kwargs["subsampling"] == "4:4:4"
+        assert save_kwargs["max_threads"] == 2
+
+    def test_conversion_drafts_jpeg_downscale(self, temp_dir):
+        """Test JPEG inputs are decoded at reduced scale before resizing."""
+        input_path = temp_dir / "large.jpg"
+        Image.new("RGB", (400, 400), "blue").save(input_path)
+        output_path = temp_dir / "output.png"
+
+        with patch.object(
+            convert_img, "draft_image", wraps=convert_img.draft_image
+        ) as mock_draft:
+            convert_img.convert_image_to_image(
+                input_path, output_path, "png", max_size=50
+            )
+
+        assert mock_draft.call_args.args[1] == (50, 50)
+        with Image.open(output_path) as result_img:
+            assert result_img.size == (50, 50)
+
+    @pytest.mark.parametrize(
+        "backend,output_format,threshold,expected",
+        [
+            ("auto", "jpeg", 20, False),
+            ("auto", "jpeg", 0, True),
+            ("vips", "webp", 20, True),
+            ("vips", "bmp", 20, False),
+            ("pillow", "jpeg", 0, False),
+        ],
+    )
+    def test_use_vips_backend(
+        self, sample_png, backend, output_format, threshold, expected
+    ):
+        """Test libvips is picked by backend, output format and image size."""
+        args = cli_args(sample_png, "out", "--backend", backend)
+        with (
+            patch.object(convert_img, "VIPS_THRESHOLD_MP", threshold),
+            Image.open(sample_png) as img,
+        ):
+            assert convert_img.use_vips_backend(args, img, output_format) is expected
+
+    @pytest.mark.parametrize(
+        "option",
+        [
+            ["--progressive"],
+            ["--subsampling", "0"],
+            ["--palette", "16"],
+            ["--resample", "bilinear"],
+            ["--avif-speed", "2"],
+            ["--threads", "1"],
+        ],
+    )
+    def test_main_auto_backend_keeps_pillow_options(
+        self, sample_png, temp_dir, option
+    ):
+        """Test auto mode stays on Pillow when an option libvips drops is set."""
+        mock_pyvips = Mock()
+        output_path = temp_dir / "output.jpg"
+
+        with (
+            patch.object(convert_img, "VIPS_THRESHOLD_MP", 0),
+            patch.dict(sys.modules, {"pyvips": mock_pyvips}),
+        ):
+            convert_img.run(cli_args(sample_png, output_path, *option))
+
+        mock_pyvips.Image.new_from_file.assert_not_called()
+        with Image.open(output_path) as result_img:
+            assert result_img.format == "JPEG"
+
+    def test_main_vips_backend(self, sample_rgba_png, temp_dir, capsys):
+        """Test --backend vips streams the conversion through pyvips."""
+        mock_pyvips = Mock()
+        vips_img = mock_pyvips.Image.new_from_file.return_value
+        vips_img.width = vips_img.height = 100
+        vips_img.bands = 4
+        vips_img.hasalpha.return_value = True
+        flat_img = vips_img.flatten.return_value
+        output_path = temp_dir / "output.jpg"
+
+        test_args = [
+            "convert_img",
+            str(sample_rgba_png),
+            str(output_path),
+            "--backend",
+            "vips",
+            "--quality",
+            "70",
+            "--progressive",
+        ]
+
+        with (
+            patch.dict(sys.modules, {"pyvips": mock_pyvips}),
+            patch.object(sys, "argv", test_args),
+        ):
+            convert_img.main()
+
+        assert "libvips backend ignores --progressive" in capsys.readouterr().out
+        mock_pyvips.Image.new_from_file.assert_called_once_with(
+            str(sample_rgba_png), access="sequential"
+        )
+        vips_img.flatten.assert_called_once_with(background=[255, 255, 255])
+        flat_img.jpegsave.assert_called_once_with(
+            str(output_path), Q=70, optimize_coding=False
+        )
+
+    def test_main_vips_backend_not_installed(self, sample_png, temp_dir):
+        """Test --backend vips falls back to Pillow without pyvips."""
+        output_path = temp_dir / "output.webp"
+
+        test_args = [
+            "convert_img",
+            str(sample_png),
+            str(output_path),
+            "--backend",
+            "vips",
+        ]
+
+        with (
+            patch.dict(sys.modules, {"pyvips": None}),
+            patch.object(sys, "argv", test_args),
+        ):
+            convert_img.main()
+
+        with Image.open(output_path) as result_img:
+            assert result_img.format == "WEBP"
+
+    @patch.object(convert_img, "save_image")
+    def test_save_animated_uniform_duration(self, mock_save, temp_dir):
+        """Test equal frame durations collapse to a single value."""
+        frames = [Image.new("RGB", (10, 10), color) for color in ("red", "blue")]
+        source_path = temp_dir / "source.gif"
+        frames[0].save(
+            source_path, save_all=True, append_images=frames[1:], duration=50
+        )
+
+        with Image.open(source_path) as source:
+            convert_img.save_animated(
+                source.copy(),
+                source,
+                temp_dir / "output.webp",
+                {"format": "WEBP"},
+                [50, 50],
+                lambda frame: frame,
+            )
+
+        save_kwargs = mock_save.call_args.args[2]
+        assert save_kwargs["duration"] == 50
+        assert save_kwargs["save_all"] is True
+        assert len(save_kwargs["append_images"]) == 1
+
+    @pytest.mark.parametrize("extra_args,shown", [([], False), (["--codec-info"], True)])
+    def test_main_reports_jpeg_codec(
+        self, sample_png, temp_dir, capsys, extra_args, shown
+    ):
+        """Test --codec-info reports which libjpeg Pillow is linked against."""
+        convert_img.run(cli_args(sample_png, temp_dir / "output.jpg", *extra_args))
+
+        out = capsys.readouterr().out
+        assert (f"JPEG codec: {convert_img.jpeg_codec_info()}" in out) is shown
+
+    @patch.object(convert_img.features, "version", return_value="9.0")
+    @patch.object(convert_img.features, "check_feature", return_value=False)
+    def test_jpeg_codec_info_without_turbo(self, mock_check, mock_version):
+        """Test a reference libjpeg build is flagged as lacking SIMD."""
+        assert convert_img.jpeg_codec_info() == "libjpeg 9.0 (no SIMD)"
+
     def test_detect_output_format_from_extension(
         self,
     ):
@@ -459,6 +1601,44 @@ class TestImageToImageConversion:
             png_img = convert_img.prepare_image_for_format(img, "png")
             assert png_img.mode == "RGBA"
 
+    @pytest.mark.parametrize("output_format", ["jpeg", "bmp"])
+    def test_prepare_image_for_format_flattens_on_white(self, output_format):
+        """Test transparent pixels are composited onto white."""
+        img = Image.new("RGBA", (10, 10), (255, 0, 0, 0))
+        img.putpixel((0, 0), (255, 0, 0, 255))
+        flat = convert_img.prepare_image_for_format(img, output_format)
+        assert flat.mode == "RGB"
+        assert flat.getpixel((0, 0)) == (255, 0, 0)
+        assert flat.getpixel((5, 5)) == (255, 255, 255)
+
+    def test_prepare_image_for_format_blends_partial_alpha(self):
+        """Test semi-transparent pixels match an alpha composite onto white."""
+        img = Image.linear_gradient("L").resize((16, 16)).convert("RGBA")
+        img.putalpha(Image.linear_gradient("L").resize((16, 16)).rotate(90))
+        bg = Image.new("RGBA", img.size, (255, 255, 255, 255))
+        expected = Image.alpha_composite(bg, img).convert("RGB")
+
+        flat = convert_img.prepare_image_for_format(img, "jpeg")
+
+        assert flat.tobytes() == expected.tobytes()
+
+    @pytest.mark.parametrize("mode", ["RGBA", "LA", "P"])
+    def test_prepare_image_for_format_opaque_skips_composite(self, mode):
+        """Test fully opaque images are converted without compositing."""
+        img = Image.new("RGB", (10, 10), (0, 128, 255)).convert(mode)
+        with patch.object(Image.Image, "paste") as mock_paste:
+            flat = convert_img.prepare_image_for_format(img, "jpeg")
+        mock_paste.assert_not_called()
+        assert flat.mode == "RGB"
+        assert flat.getpixel((0, 0)) == img.convert("RGB").getpixel((0, 0))
+
+    @pytest.mark.parametrize("mode", ["RGB", "RGBA", "LA"])
+    def test_prepare_image_for_format_gif_quantize(self, mode):
+        """Test GIF preparation quantizes to a palette image."""
+        img = Image.new(mode, (20, 20))
+        gif_img = convert_img.prepare_image_for_format(img, "gif")
+        assert gif_img.mode == "P"
+
     @pytest.mark.parametrize(
         "input_format,output_format",
         [
@@ -477,35 +1657,46 @@ class TestImageToImageConversion:
     )
     def test_image_to_image_conversion(
         self,
-        temp_dir,
+        request,
         input_format,
         output_format,
     ):
         """Test conversion between different image formats."""
-        # Create input image
-        input_path = temp_dir / f"input.{input_format}"
-        output_path = temp_dir / f"output.{output_format}"
-
-        img = Image.new("RGB", (100, 100), color="blue")
-        img.save(input_path, input_format.upper())
+        # Reuse the session's sample image of the input format
+        input_path = request.getfixturevalue(f"sample_{input_format}")
+        # Encode in memory; the other tests cover writing to disk
+        output = io.BytesIO()
 
         # Perform conversion
         convert_img.convert_image_to_image(
             input_path,
-            output_path,
+            output,
             output_format,
             quality=85,
         )
 
         # Verify output
-        assert output_path.exists()
-        with Image.open(output_path) as result_img:
+        output.seek(0)
+        with Image.open(output) as result_img:
             assert (
                 result_img.format.lower()
                 == convert_img.get_pillow_format(output_format).lower()
             )
             assert result_img.size == (100, 100)
 
+    def test_conversion_from_stream(self, sample_jpeg, capsys):
+        """Test converting between in-memory streams."""
+        source = io.BytesIO(sample_jpeg.read_bytes())
+        output = io.BytesIO()
+
+        convert_img.convert_image_to_image(source, output, "png", max_size=50)
+
+        assert "Converted <stream> → <stream>" in capsys.readouterr().out
+        output.seek(0)
+        with Image.open(output) as result_img:
+            assert result_img.format == "PNG"
+            assert result_img.size == (50, 50)
+
     def test_conversion_with_resize(self, sample_png, temp_dir):
         """Test image conversion with resizing."""
         output_path = temp_dir / "resized.jpeg"
@@ -523,6 +1714,47 @@ class TestImageToImageConversion:
             assert result_img.size == (50, 75)
             assert result_img.format == "JPEG"
 
+    def test_optimized_png_palettizes_losslessly(self, sample_png, temp_dir):
+        """Test --optimize stores few-color PNG output as an exact palette."""
+        output_path = temp_dir / "optimized.png"
+
+        convert_img.convert_image_to_image(
+            sample_png, output_path, "png", optimize=True
+        )
+
+        with Image.open(output_path) as result_img, Image.open(sample_png) as src:
+            assert result_img.mode == "P"
+            assert result_img.convert("RGB").tobytes() == src.convert("RGB").tobytes()
+
+    def test_png_palette_quantizes(self, temp_dir):
+        """Test an explicit palette size quantizes many-color PNG output."""
+        input_path = temp_dir / "gradient.png"
+        Image.linear_gradient("L").convert("RGB").save(input_path)
+        output_path = temp_dir / "quantized.png"
+
+        convert_img.convert_image_to_image(
+            input_path, output_path, "png", palette=16
+        )
+
+        with Image.open(output_path) as result_img:
+            assert result_img.mode == "P"
+            assert len(result_img.getcolors()) <= 16
+
+    def test_optimized_png_keeps_many_colors(self, temp_dir):
+        """Test --optimize leaves images with too many colors as RGB."""
+        input_path = temp_dir / "noise.png"
+        Image.merge(
+            "RGB", [Image.effect_noise((64, 64), 64) for _ in range(3)]
+        ).save(input_path)
+        output_path = temp_dir / "optimized.png"
+
+        convert_img.convert_image_to_image(
+            input_path, output_path, "png", optimize=True
+        )
+
+        with Image.open(output_path) as result_img:
+            assert result_img.mode == "RGB"
+
     def test_conversion_with_max_size(self, sample_png, temp_dir):
         """Test image conversion with max size constraint."""
         output_path = temp_dir / "max_size.webp"
@@ -543,16 +1775,7 @@ class TestImageToImageConversion:
         """Test main function with image-to-image conversion."""
         output_path = temp_dir / "converted.jpeg"
 
-        test_args = [
-            "convert_img",
-            str(sample_png),
-            str(output_path),
-            "--quality",
-            "80",
-        ]
-
-        with patch.object(sys, "argv", test_args):
-            convert_img.main()
+        convert_img.run(cli_args(sample_png, output_path, "--quality", "80"))
 
         assert output_path.exists()
         with Image.open(output_path) as result_img:
@@ -562,23 +1785,58 @@ class TestImageToImageConversion:
         """Test main function with explicit format specification."""
         output_path = temp_dir / "output.bin"  # Unknown extension
 
-        test_args = [
-            "convert_img",
-            str(sample_png),
-            str(output_path),
-            "--format",
-            "webp",
-            "--quality",
-            "75",
-        ]
-
-        with patch.object(sys, "argv", test_args):
-            convert_img.main()
+        convert_img.run(
+            cli_args(sample_png, output_path, "--format", "webp", "--quality", "75")
+        )
 
         assert output_path.exists()
         with Image.open(output_path) as result_img:
             assert result_img.format == "WEBP"
 
+    @pytest.mark.parametrize(
+        "tiff_compression,expected",
+        [
+            ("zstd", ("zstd", "tiff_adobe_deflate")),
+            ("deflate", ("tiff_adobe_deflate",)),
+            ("lzw", ("tiff_lzw",)),
+            ("none", ("raw",)),
+        ],
+    )
+    def test_conversion_tiff_compression(
+        self, sample_png, temp_dir, tiff_compression, expected
+    ):
+        """Test TIFF output uses the requested compression."""
+        output_path = temp_dir / "compressed.tiff"
+
+        convert_img.convert_image_to_image(
+            sample_png,
+            output_path,
+            "tiff",
+            tiff_compression=tiff_compression,
+        )
+
+        with Image.open(output_path) as result_img:
+            assert result_img.info["compression"] in expected
+
+    def test_conversion_webp_lossless(self, temp_dir):
+        """Test lossless WebP conversion preserves pixel data."""
+        input_path = temp_dir / "gradient.png"
+        output_path = temp_dir / "lossless.webp"
+        img = Image.linear_gradient("L").convert("RGB")
+        img.save(input_path, "PNG")
+
+        convert_img.convert_image_to_image(
+            input_path,
+            output_path,
+            "webp",
+            webp_method=6,
+            webp_lossless=True,
+        )
+
+        with Image.open(output_path) as result_img:
+            assert result_img.format == "WEBP"
+            assert result_img.convert("RGB").tobytes() == img.tobytes()
+
     def test_transparency_preservation_png_to_png(self, sample_rgba_png, temp_dir):
         """Test that transparency is preserved in PNG to PNG conversion."""
         output_path = temp_dir / "transparent.png"